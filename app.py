@@ -1,8 +1,22 @@
 from shiny import App, reactive, render, ui
 import json
-import base64
-import requests
+import asyncio
 import os
+import time
+from pathlib import Path
+
+import metrics
+import shared_store
+from fragment_cache import FragmentCache
+from github_scheduler import scheduler
+from github_sync import GitHubError
+from local_cache import open_cache
+from task_archive import Archive, archive_record, restore_record
+from task_batch import Batch
+from task_merge import merge_lists
+from task_io import FORMATS, detect_format, iter_export, read_file, read_text
+from task_store import Task, TaskList
+from todo_codec import dump_snapshot, load_snapshot, snapshot_size
 
 # Define the list names
 LIST_NAMES = {
@@ -16,6 +30,38 @@ LIST_NAMES = {
     "list8": "Miscellaneous"
 }
 
+# Tasks per page in the list cards and the task selector
+PAGE_SIZE = 50
+
+# Largest snapshot kept in the browser's localStorage, whose quota is about
+# 5 MB per site; beyond it the browser keeps none and a reload starts from
+# GitHub or the server cache
+BROWSER_SNAPSHOT_LIMIT = 2 * 2**20
+
+# Server-side snapshot cache, only when TODO_CACHE_DB is set
+local_cache = open_cache()
+
+
+def cache_lists(client, lists):
+    if local_cache is not None:
+        local_cache.put(client.repo, client.token, dump_snapshot(lists))
+
+
+def render_task(task):
+    # Draggable; see the drop handling in www/script.js
+    return str(ui.div(
+        ui.h5(f"• {task.title}"),
+        ui.p(task.description,style="text-indent:50px"),
+        style="margin-bottom: 0; cursor: move;",
+        class_="task-item",
+        draggable="true",
+        data_task_id=task.id
+    ))
+
+
+# Rendered task HTML, shared by every list card in every session
+task_fragments = FragmentCache(render_task)
+
 app_ui = ui.page_sidebar(
     ui.sidebar(
         ui.input_select(
@@ -27,14 +73,37 @@ app_ui = ui.page_sidebar(
         ui.input_text("task", "Enter Task"),
         ui.input_text("description", "Enter Description"),
         ui.input_action_button("add", "Add Task", class_="btn-primary"),
+        ui.output_ui("undo_controls"),
         ui.hr(),
         ui.h4("Manage Tasks"),
+        ui.input_text("search", "Search All Lists"),
+        ui.output_ui("search_results"),
         ui.output_ui("task_selector"),
         ui.output_ui("edit_controls"),  # Moved up
         ui.hr(),  # Added hr here
         ui.output_ui("move_controls"),  # Moved down
         ui.hr(),
 
+        ui.h4("Import / Export"),
+        ui.input_file(
+            "import_file",
+            "Import File (CSV, JSON Lines or text)",
+            accept=[".csv", ".jsonl", ".ndjson", ".txt"]
+        ),
+        ui.input_text_area("import_text", "Or Paste Tasks"),
+        ui.input_select("import_format", "Pasted Format", FORMATS, selected="txt"),
+        ui.input_action_button("import_pasted", "Import Pasted Tasks", class_="btn-primary"),
+        ui.output_text("import_status_output"),
+        ui.input_select("export_format", "Export Format", FORMATS),
+        ui.download_button("export_tasks", "Export All Lists"),
+        ui.hr(),
+
+        ui.h4("Archive"),
+        ui.input_text("archive_search", "Search Completed Tasks"),
+        ui.input_action_button("search_archive", "Search Archive", class_="btn-info"),
+        ui.output_ui("archive_results"),
+        ui.hr(),
+
         # Add GitHub save controls
         ui.h4("Save to GitHub"),
         ui.input_text(
@@ -50,7 +119,10 @@ app_ui = ui.page_sidebar(
         ),
         
      #   ui.input_text("github_path", "File path (e.g., tasks.txt)"),
+        ui.input_checkbox("auto_save", "Auto-save changes to GitHub", False),
         ui.output_text("github_status_output"),
+        ui.output_text("github_queue_output"),
+        ui.output_ui("github_sync_controls"),
      #   ui.input_action_button("save_github", "Save to GitHub", class_="btn-success"),        
         ui.input_action_button("load_github", "Load from GitHub", class_="btn-info"),
        
@@ -71,60 +143,260 @@ app_ui = ui.page_sidebar(
         ),
         ui.output_ui("unsaved_changes_alert"),  # Add this line
         ui.output_ui("task_lists_display")
-    )
+    ),
+    ui.head_content(ui.tags.script(src="script.js"))
 )
 
 def server(input, output, session):
-    # Create a dictionary to store tasks and descriptions for each list
-    lists_data = reactive.value({
-        list_id: {"tasks": [], "descriptions": []}
-        for list_id in LIST_NAMES.keys()
-    })
-    
-    changes_unsaved = reactive.value(False)
+    # The board this session works on: private until a repo is loaded, saved
+    # or restored, then shared with every other session on the same repo
+    board = reactive.value(shared_store.private_board(LIST_NAMES))
     editing = reactive.value(False)
-    
 
-           
+    # Only one page of each list is sent to the browser. The selection is kept
+    # here, by task id, so it survives paging through the selector.
+    selected_ids = reactive.value(())
+    selector_page = reactive.value(0)
+    # Bumped when the selection is set from outside the selector's checkboxes
+    selector_refresh = reactive.value(0)
+    # Search picks waiting for the switch to their list to arrive
+    pending_selection = reactive.value(())
+    card_pages = {list_id: reactive.value(0) for list_id in LIST_NAMES.keys()}
+
+    def lists_data(list_id):
+        return board.get().lists[list_id]
+
+    def mark_changed():
+        board.get().mark_changed()
+
+    def attach_board(client):
+        # Only with a client whose token GitHub has confirmed; see with_access()
+        current = board.get()
+        if current.repo == client.repo:
+            return current
+        shared = shared_store.acquire(client, LIST_NAMES)
+        if current.repo is None:
+            # Carry over anything typed (or archived) before a repo was chosen
+            with reactive.isolate():
+                if current.unsaved.get():
+                    shared.set_all(current.get_all())
+                    shared.archive_pending.extend(current.archive_pending)
+                    shared.mark_changed()
+        shared_store.release(current)
+        board.set(shared)
+        return shared
+
+    @session.on_ended
+    def detach_board():
+        with reactive.isolate():
+            shared_store.release(board.get())
+
+    @reactive.effect
+    @metrics.timed
+    def follow_other_workers():
+        # With a shared state backend, other processes edit the same boards
+        current = board.get()
+        if current.repo is None or not shared_store.backend.shared:
+            return
+        reactive.invalidate_later(shared_store.POLL_INTERVAL)
+        with reactive.isolate():
+            current.refresh()
 
     def get_current_list():
-        return lists_data.get()[input.active_list()]
+        return lists_data(input.active_list()).get()
+
+    def get_all_lists():
+        return board.get().get_all()
+
+    def get_selected_ids():
+        return selected_ids.get()
+
+    def page_bounds(page, total):
+        # Clamp the page to the list (it may have shrunk) and return its range
+        page = max(0, min(page, (total - 1) // PAGE_SIZE))
+        start = page * PAGE_SIZE
+        return page, start, min(total, start + PAGE_SIZE)
+
+    def pager(prefix, start, stop, total):
+        if total <= PAGE_SIZE:
+            return ui.div()
+        return ui.div(
+            ui.input_action_button(f"{prefix}_prev", "‹ Prev", class_="btn-outline-secondary btn-sm", disabled=start == 0),
+            ui.span(f"{start + 1}–{stop} of {total}"),
+            ui.input_action_button(f"{prefix}_next", "Next ›", class_="btn-outline-secondary btn-sm", disabled=stop >= total),
+            style="display: flex; gap: 10px; align-items: center;"
+        )
+
+    def register_pager(prefix, page_value, get_total):
+        @reactive.effect
+        @reactive.event(input[f"{prefix}_prev"])
+        @metrics.timed(name=f"{prefix}_prev")
+        def previous_page():
+            page_value.set(max(0, page_value.get() - 1))
+
+        @reactive.effect
+        @reactive.event(input[f"{prefix}_next"])
+        @metrics.timed(name=f"{prefix}_next")
+        def next_page():
+            page, _, stop = page_bounds(page_value.get(), get_total())
+            if stop < get_total():
+                page_value.set(page + 1)
+
+    def show_position(position):
+        # Keep the selector on the page where a moved task ended up
+        selector_page.set(position // PAGE_SIZE)
+
+    def selection_window():
+        # (list_id, start, stop) of the selector's page, where selected tasks
+        # usually are; lookups search it before the rest of the list
+        _, start, stop = page_bounds(selector_page.get(), len(get_current_list()))
+        return input.active_list(), start, stop
+
+    def get_selected_positions():
+        # Checkbox values are task ids; resolve them to positions in the active list
+        _, start, stop = selection_window()
+        positions = get_current_list().positions_of(get_selected_ids(), start, stop)
+        return sorted(positions.values())
 
     @reactive.effect
     @reactive.event(input.add)
+    @metrics.timed
     def add_task():
         if input.task().strip():
-            current_data = lists_data.get().copy()
-            current_list = current_data[input.active_list()]
-            
-            current_list["tasks"].append(input.task())
-            current_list["descriptions"].append(input.description())
-            
-            lists_data.set(current_data)
-            changes_unsaved.set(True)  # Add this line
+            current_list = get_current_list()
+            lists_data(input.active_list()).set(
+                current_list.append(Task(input.task(), input.description()))
+            )
+            mark_changed()
             ui.update_text("task", value="")
             ui.update_text("description", value="")
 
     @output
     @render.ui
+    @metrics.rendered
+    def undo_controls():
+        current = board.get()
+        current.history_version.get()
+        return ui.div(
+            ui.input_action_button("undo", "↶ Undo", class_="btn-outline-secondary btn-sm", disabled=not current.history.can_undo()),
+            ui.input_action_button("redo", "↷ Redo", class_="btn-outline-secondary btn-sm", disabled=not current.history.can_redo()),
+            style="display: flex; gap: 10px; margin-top: 10px;"
+        )
+
+    @reactive.effect
+    @reactive.event(input.undo)
+    @metrics.timed
+    def undo():
+        if not board.get().undo():
+            github_status.set("Nothing to undo, or the lists changed since")
+
+    @reactive.effect
+    @reactive.event(input.redo)
+    @metrics.timed
+    def redo():
+        if not board.get().redo():
+            github_status.set("Nothing to redo, or the lists changed since")
+
+    @output
+    @render.ui
+    @metrics.rendered
     def task_selector():
         current_list = get_current_list()
-        if not current_list["tasks"]:
+        if not current_list:
             return ui.p("No tasks in this list")
         
-        options = {str(i): f"{i}. {task}" 
-                  for i, task in enumerate(current_list["tasks"], 1)}
+        _, start, stop = page_bounds(selector_page.get(), len(current_list))
+        options = {task.id: f"{i}. {task.title}" 
+                  for i, task in enumerate(current_list.slice(start, stop), start + 1)}
+        selector_refresh.get()
+        
+        # Task ids are stable, so keep whatever is still selected across re-renders
+        with reactive.isolate():
+            selected = [task_id for task_id in get_selected_ids() if task_id in options]
         
         return ui.div(
             ui.input_checkbox_group(
                 "selected_tasks",
                 "Select Tasks to Move/Edit",
-                options
+                options,
+                selected=selected
+            ),
+            pager("selector", start, stop, len(current_list))
+        )
+
+    register_pager("selector", selector_page, lambda: len(get_current_list()))
+
+    @reactive.effect
+    @reactive.event(input.selected_tasks, ignore_none=False)
+    @metrics.timed
+    def sync_selection():
+        # The checkboxes only cover the visible page; selections elsewhere stay
+        checked = input.selected_tasks() or ()
+        current_list = get_current_list()
+        _, start, stop = page_bounds(selector_page.get(), len(current_list))
+        page_ids = {task.id for task in current_list.slice(start, stop)}
+        kept = [task_id for task_id in selected_ids.get() if task_id not in page_ids]
+        selected_ids.set(tuple(kept) + tuple(checked))
+
+    @reactive.effect
+    @reactive.event(input.active_list)
+    @metrics.timed
+    def reset_selection():
+        selected_ids.set(pending_selection.get())
+        pending_selection.set(())
+        positions = get_selected_positions()
+        show_position(positions[0] if positions else 0)
+        selector_refresh.set(selector_refresh.get() + 1)
+
+    @output
+    @render.ui
+    @metrics.rendered
+    def search_results():
+        query = input.search().strip()
+        if not query:
+            return ui.div()
+        total, results = board.get().search(query)
+        if not total:
+            return ui.p("No matching tasks")
+        
+        options = {task.id: f"{LIST_NAMES[list_id]}: {task.title}" for list_id, task in results}
+        with reactive.isolate():
+            checked = input.search_selected() if "search_selected" in input else ()
+        return ui.div(
+            ui.input_checkbox_group(
+                "search_selected",
+                f"Showing {len(results)} of {total} matches",
+                options,
+                selected=[task_id for task_id in checked or () if task_id in options]
             )
         )
 
+    @reactive.effect
+    @reactive.event(input.search_selected)
+    @metrics.timed
+    def select_search_results():
+        # Select the checked matches for move/edit, switching to their list.
+        # Move and edit work on one list, so picks from other lists are dropped.
+        checked = input.search_selected()
+        with reactive.isolate():
+            located = board.get().search_index.locate(checked)
+        if not located:
+            return
+        list_id = located[checked[-1]] if checked[-1] in located else next(iter(located.values()))
+        picked = tuple(task_id for task_id in checked if located.get(task_id) == list_id)
+        if list_id != input.active_list():
+            pending_selection.set(picked)
+            ui.update_select("active_list", selected=list_id)
+            return
+        selected_ids.set(picked)
+        positions = get_selected_positions()
+        if positions:
+            show_position(positions[0])
+        selector_refresh.set(selector_refresh.get() + 1)
+
     @output
     @render.ui
+    @metrics.rendered
     def task_lists_display():
         selected_lists = input.display_lists()
         if not selected_lists:
@@ -133,41 +405,52 @@ def server(input, output, session):
         col_width = 12 // len(selected_lists)
         col_width = max(3, min(12, col_width))
         
-        columns = []
-        for list_id in selected_lists:
-            current_list = lists_data.get()[list_id]
-            current_tasks = current_list["tasks"]
-            current_descriptions = current_list["descriptions"]
+        # Only the layout lives here; each card is its own output so editing
+        # one list doesn't rebuild the others
+        columns = [
+            ui.column(col_width, ui.output_ui(f"list_card_{list_id}"))
+            for list_id in selected_lists
+        ]
+        
+        return ui.row(*columns)
+
+    def register_list_card(list_id):
+        @output(id=f"list_card_{list_id}")
+        @render.ui
+        @metrics.rendered(name=f"list_card_{list_id}")
+        def list_card():
+            current_list = lists_data(list_id).get()
+            _, start, stop = page_bounds(card_pages[list_id].get(), len(current_list))
             
             task_items = []
             task_items.append(ui.h3(LIST_NAMES[list_id]))
             
-            if not current_tasks:
+            if not current_list:
                 task_items.append(ui.p("No tasks in this list"))
             else:
-                for i, (task, desc) in enumerate(zip(current_tasks, current_descriptions), 1):
-                    task_html = ui.div(
-                        ui.h5(f"• {task}"),
-                        ui.p(desc,style="text-indent:50px"),
-                        style="margin-bottom: 0;"
-                    )
-                    task_items.append(task_html)
+                # Only tasks the cache hasn't seen are built as tags
+                html, hits, misses = task_fragments.join(current_list.slice(start, stop))
+                metrics.record_fragments(hits, misses)
+                task_items.append(ui.HTML(html))
+                task_items.append(pager(f"card_{list_id}", start, stop, len(current_list)))
                 
-            column = ui.column(
-                col_width,
-                ui.card(
-                    *task_items,
-                    style="height: 100%;"
-                )
+            return ui.card(
+                *task_items,
+                style="height: 100%;",
+                class_="task-card",
+                data_list_id=list_id
             )
-            columns.append(column)
-        
-        return ui.row(*columns)
+
+        register_pager(f"card_{list_id}", card_pages[list_id], lambda: len(lists_data(list_id).get()))
+
+    for list_id in LIST_NAMES.keys():
+        register_list_card(list_id)
 
     @output
     @render.ui
+    @metrics.rendered
     def move_controls():
-        if not input.selected_tasks():
+        if not get_selected_ids():
             return ui.div()
             
         current_list_id = input.active_list()
@@ -182,17 +465,29 @@ def server(input, output, session):
                 move_options
             ),
             ui.input_action_button("move_tasks", "Move Selected Tasks", class_="btn-info"),
+            ui.input_action_button("archive_tasks", "✓ Complete and Archive", class_="btn-success"),
+            ui.h4("Reorder Selected Tasks"),
+            ui.div(
+                ui.input_action_button("move_top", "⤒ Top", class_="btn-primary"),
+                ui.input_action_button("move_bottom", "⤓ Bottom", class_="btn-primary"),
+                style="display: flex; gap: 10px;"
+            ),
+            ui.input_numeric("target_position", "Position", value=1, min=1),
+            ui.input_action_button("move_to_position", "Move to Position", class_="btn-primary"),
         )
 
     @output
     @render.ui
+    @metrics.rendered
     def edit_controls():
-        if not input.selected_tasks() or len(input.selected_tasks()) != 1:
+        if len(get_selected_ids()) != 1:
             return ui.div()
         
         if editing.get():
-            task_idx = int(input.selected_tasks()[0]) - 1
-            current_list = get_current_list()
+            positions = get_selected_positions()
+            if not positions:
+                return ui.div()
+            task = get_current_list()[positions[0]]
             
             return ui.div(
                 ui.hr(),
@@ -200,12 +495,12 @@ def server(input, output, session):
                 ui.input_text(
                     "edit_task",
                     "Task",
-                    value=current_list["tasks"][task_idx]
+                    value=task.title
                 ),
                 ui.input_text(
                     "edit_description",
                     "Description",
-                    value=current_list["descriptions"][task_idx]
+                    value=task.description
                 ),
                 ui.input_action_button("save_edit", "Save", class_="btn-success"),
                 ui.input_action_button("cancel_edit", "Cancel", class_="btn-secondary"),
@@ -225,128 +520,339 @@ def server(input, output, session):
 
     @reactive.effect
     @reactive.event(input.move_tasks)
+    @metrics.timed
     def move_selected_tasks():
-        if not input.selected_tasks():
+        if not get_selected_ids():
             return
             
-        selected_indices = [int(idx) - 1 for idx in input.selected_tasks()]
-        source_list_id = input.active_list()
-        target_list_id = input.move_to_list()
-        
-        current_data = lists_data.get().copy()
-        source_list = current_data[source_list_id]
-        target_list = current_data[target_list_id]
-        
-        # Get tasks and descriptions to move
-        tasks_to_move = [source_list["tasks"][i] for i in selected_indices]
-        descriptions_to_move = [source_list["descriptions"][i] for i in selected_indices]
-        
-        # Add to target list
-        target_list["tasks"].extend(tasks_to_move)
-        target_list["descriptions"].extend(descriptions_to_move)
+        # Tasks keep their ids when they change lists
+        batch = Batch()
+        batch.retarget(get_selected_ids(), input.move_to_list(), near=selection_window())
+        board.get().apply(batch)
+        selected_ids.set(())
+
+    @reactive.effect
+    @reactive.event(input.archive_tasks)
+    @metrics.timed
+    def archive_selected_tasks():
+        task_ids = get_selected_ids()
+        if not task_ids:
+            return
+        # The tasks leave their lists now and reach the archive on the next save
+        current = board.get()
+        near = selection_window()
+        wanted = set(task_ids)
+        records = []
+        # The active list, where they were selected, first
+        for list_id, tasks in sorted(get_all_lists().items(), key=lambda item: item[0] != near[0]):
+            if not wanted:
+                break
+            positions = tasks.positions_of(wanted, *(near[1:] if list_id == near[0] else ()))
+            records.extend(archive_record(list_id, tasks[i]) for i in sorted(positions.values()))
+            wanted.difference_update(positions)
+        current.archive_pending.extend(records)
+        batch = Batch()
+        batch.delete(task_ids, near=near)
+        current.apply(batch)
+        selected_ids.set(())
+        github_status.set(f"Archived {len(records)} task{'s' if len(records) != 1 else ''}; saving moves them to the repo")
+
+    def reorder(task_ids, list_id, position=None, near=None):
+        # Any reorder, including a block of tasks, is one batch move and so
+        # one update, never a chain of neighbour swaps. `near`: where the
+        # tasks probably are, the selector's page unless given.
+        batch = Batch()
+        batch.move(task_ids, list_id, position, near=near or selection_window())
+        board.get().apply(batch)
+        if list_id == input.active_list():
+            positions = get_selected_positions()
+            if positions:
+                show_position(positions[0])
+
+    @reactive.effect
+    @reactive.event(input.move_top)
+    @metrics.timed
+    def move_to_top():
+        if get_selected_ids():
+            reorder(get_selected_ids(), input.active_list(), 0)
+
+    @reactive.effect
+    @reactive.event(input.move_bottom)
+    @metrics.timed
+    def move_to_bottom():
+        if get_selected_ids():
+            reorder(get_selected_ids(), input.active_list())
+
+    @reactive.effect
+    @reactive.event(input.move_to_position)
+    @metrics.timed
+    def move_to_position():
+        position = input.target_position()
+        if get_selected_ids() and position is not None:
+            reorder(get_selected_ids(), input.active_list(), max(0, int(position) - 1))
+
+    @reactive.effect
+    @reactive.event(input.drop_task)
+    @metrics.timed
+    def drop_task():
+        # Sent by script.js when a task is dragged onto a list card: either
+        # before/after another task, or onto the card itself for the end
+        drop = input.drop_task()
+        task_id, list_id, before = drop.get("task"), drop.get("list"), drop.get("before")
+        if list_id not in LIST_NAMES:
+            return
+        # Dragging one of the selected tasks carries the whole selection along
+        dragging_selection = task_id in get_selected_ids()
+        task_ids = get_selected_ids() if dragging_selection else (task_id,)
+        if before in task_ids:
+            return
         
-        # Remove from source list (in reverse order to maintain indices)
-        for i in sorted(selected_indices, reverse=True):
-            source_list["tasks"].pop(i)
-            source_list["descriptions"].pop(i)
+        # The list they're dragged from, if script.js said
+        source = input.active_list() if dragging_selection else drop.get("from")
+        near = None
+        if not dragging_selection and source in LIST_NAMES:
+            near = (source, *page_bounds(card_pages[source].get(), len(lists_data(source).get()))[1:])
+
+        position = None
+        if before is not None:
+            # Only tasks dragged within this list can be ahead of the drop point
+            dragged = task_ids if source in (None, list_id) else ()
+            tasks = lists_data(list_id).get()
+            _, start, stop = page_bounds(card_pages[list_id].get(), len(tasks))
+            positions = tasks.positions_of((before, *dragged), start, stop)
+            if before not in positions:
+                return
+            position = positions[before] + (1 if drop.get("after") else 0)
+            # Position counts from after the dragged tasks are taken out
+            position -= sum(1 for task_id in task_ids if positions.get(task_id, position) < position)
         
-        lists_data.set(current_data)
-        changes_unsaved.set(True)  # Add this line
+        if dragging_selection and list_id != input.active_list():
+            selected_ids.set(())
+        reorder(task_ids, list_id, position, near)
 
     @reactive.effect
     @reactive.event(input.start_edit)
+    @metrics.timed
     def start_editing():
         editing.set(True)
 
     @reactive.effect
     @reactive.event(input.cancel_edit)
+    @metrics.timed
     def cancel_editing():
         editing.set(False)
 
     @reactive.effect
     @reactive.event(input.save_edit)
+    @metrics.timed
     def save_edit():
-        if not input.selected_tasks():
+        if not get_selected_ids():
             return
             
-        task_idx = int(input.selected_tasks()[0]) - 1
-        current_data = lists_data.get().copy()
-        current_list = current_data[input.active_list()]
-        
-        current_list["tasks"][task_idx] = input.edit_task()
-        current_list["descriptions"][task_idx] = input.edit_description()
+        positions = get_selected_positions()
+        if not positions:
+            return
+        task_idx = positions[0]
+        current_list = get_current_list()
         
-        lists_data.set(current_data)
-        changes_unsaved.set(True)  # Add this line
+        task = current_list[task_idx].replace(
+            title=input.edit_task(),
+            description=input.edit_description()
+        )
+        lists_data(input.active_list()).set(current_list.replace(task_idx, task))
+        mark_changed()
         editing.set(False)
 
+    import_status = reactive.value("")
+
+    @output
+    @render.text
+    @metrics.rendered
+    def import_status_output():
+        return import_status.get()
+
+    def import_tasks(read):
+        # All imported tasks go in as one batch: one update per touched list
+        try:
+            tasks = read()
+        except ValueError as error:
+            import_status.set(f"Import failed: {error}")
+            return False
+        batch = Batch()
+        for list_id, items in tasks.items():
+            batch.add(list_id, items)
+        board.get().apply(batch)
+        import_status.set(f"Imported {sum(len(items) for items in tasks.values())} tasks")
+        return True
+
+    @reactive.effect
+    @reactive.event(input.import_file)
+    @metrics.timed
+    def import_from_file():
+        file = input.import_file()[0]
+        import_tasks(lambda: read_file(
+            file["datapath"], detect_format(file["name"]), LIST_NAMES, input.active_list()
+        ))
+
+    @reactive.effect
+    @reactive.event(input.import_pasted)
+    @metrics.timed
+    def import_pasted_text():
+        text = input.import_text()
+        if not text.strip():
+            return
+        if import_tasks(lambda: read_text(text, input.import_format(), LIST_NAMES, input.active_list())):
+            ui.update_text_area("import_text", value="")
+
+    @render.download_button(filename=lambda: f"tasks.{input.export_format()}")
+    def export_tasks():
+        with reactive.isolate():
+            lists = get_all_lists()
+            fmt = input.export_format()
+        yield from iter_export(lists, LIST_NAMES, fmt)
+
+    # Archived tasks for this session's searches, read from GitHub on demand
+    archive = reactive.value(None)
+    # Bumped when the archive in `archive` changes in place
+    archive_refresh = reactive.value(0)
+
+    @reactive.extended_task
+    async def archive_task(client, pending):
+        records = await asyncio.to_thread(client.load_archive)
+        return await asyncio.to_thread(Archive, LIST_NAMES, records + pending)
+
+    @reactive.effect
+    @reactive.event(input.search_archive)
+    @metrics.timed
+    def search_archive():
+        current = board.get()
+        if not input.github_token() or not input.github_repo():
+            # Only what was archived here and not saved yet
+            archive.set(Archive(LIST_NAMES, current.archive_pending))
+            return
+        if archive_task.status() == "running":
+            return
+        github_status.set("Reading the archive from GitHub...")
+
+        def read_archive(client):
+            target = attach_board(client)
+            archive_task.invoke(client, list(target.archive_pending))
+
+        with_access(read_archive)
+
+    @reactive.effect
+    @metrics.timed
+    def archive_loaded():
+        status = archive_task.status()
+        with reactive.isolate():
+            if status == "success":
+                archive.set(archive_task.value.get())
+                github_status.set("")
+            elif status == "error":
+                error = archive_task.error.get()
+                if isinstance(error, GitHubError):
+                    github_status.set(f"Error reading the archive: {error.status_code}")
+                else:
+                    github_status.set(f"Error reading the archive: {str(error)}")
+
+    @output
+    @render.ui
+    @metrics.rendered
+    def archive_results():
+        current = archive.get()
+        archive_refresh.get()
+        if current is None:
+            return ui.div()
+        total, results = current.search(input.archive_search())
+        if not results:
+            return ui.p("No archived tasks found")
+        choices = {
+            task.id: f"{task.title} ({LIST_NAMES[list_id]}, {archived_at[:10]})"
+            for list_id, task, archived_at in results
+        }
+        return ui.div(
+            ui.input_checkbox_group(
+                "archive_selected",
+                f"{len(results)} of {total} archived tasks",
+                choices
+            ),
+            ui.input_action_button("restore_tasks", "Restore Selected", class_="btn-warning")
+        )
+
+    @reactive.effect
+    @reactive.event(input.restore_tasks)
+    @metrics.timed
+    def restore_archived_tasks():
+        current = archive.get()
+        task_ids = input.archive_selected()
+        if current is None or not task_ids:
+            return
+        # Back to the end of the list each came from, with the same id; a
+        # task that is already live again is left alone
+        live = set()
+        for tasks in get_all_lists().values():
+            live.update(tasks.positions_of(task_ids))
+        batch = Batch()
+        records = []
+        for task_id in task_ids:
+            if task_id in current.tasks and task_id not in live:
+                list_id, task, _ = current.tasks[task_id]
+                batch.add(list_id, [task])
+                records.append(restore_record(task_id))
+        if not records:
+            return
+        target = board.get()
+        target.archive_pending.extend(records)
+        target.apply(batch)
+        current.apply(records)
+        archive_refresh.set(archive_refresh.get() + 1)
+        github_status.set(f"Restored {len(records)} task{'s' if len(records) != 1 else ''}")
+
     # Add a reactive value for GitHub save status
     github_status = reactive.value("")
 
     @output
     @render.text
+    @metrics.rendered
     def github_status_output():
         return github_status.get()
 
     @reactive.effect
     @reactive.event(input.move_up)
+    @metrics.timed
     def move_task_up():
-        if not input.selected_tasks() or len(input.selected_tasks()) != 1:
+        if len(get_selected_ids()) != 1:
             return
             
-        task_idx = int(input.selected_tasks()[0]) - 1
-        if task_idx <= 0:  # Can't move up if already at top
+        positions = get_selected_positions()
+        if not positions or positions[0] <= 0:  # Can't move up if already at top
             return
+        task_idx = positions[0]
             
-        current_data = lists_data.get().copy()
-        current_list = current_data[input.active_list()]
-        
-        # Swap tasks
-        current_list["tasks"][task_idx], current_list["tasks"][task_idx-1] = \
-            current_list["tasks"][task_idx-1], current_list["tasks"][task_idx]
-        
-        # Swap descriptions
-        current_list["descriptions"][task_idx], current_list["descriptions"][task_idx-1] = \
-            current_list["descriptions"][task_idx-1], current_list["descriptions"][task_idx]
-        
-        lists_data.set(current_data)
-        changes_unsaved.set(True)  # Add this line
-        
-        # Update the selection to follow the moved task
-        ui.update_checkbox_group(
-            "selected_tasks",
-            selected=[str(task_idx)]  # Index is 0-based, but UI is 1-based
-        )
+        current_list = get_current_list()
+        lists_data(input.active_list()).set(current_list.move(task_idx, task_idx - 1))
+        show_position(task_idx - 1)
+        mark_changed()
+        # The selection follows the task because options are keyed by task id
 
     @reactive.effect
     @reactive.event(input.move_down)
+    @metrics.timed
     def move_task_down():
-        if not input.selected_tasks() or len(input.selected_tasks()) != 1:
+        if len(get_selected_ids()) != 1:
             return
             
-        task_idx = int(input.selected_tasks()[0]) - 1
-        current_data = lists_data.get().copy()
-        current_list = current_data[input.active_list()]
+        positions = get_selected_positions()
+        current_list = get_current_list()
         
-        if task_idx >= len(current_list["tasks"]) - 1:  # Can't move down if already at bottom
+        if not positions or positions[0] >= len(current_list) - 1:  # Can't move down if already at bottom
             return
+        task_idx = positions[0]
             
-        # Swap tasks
-        current_list["tasks"][task_idx], current_list["tasks"][task_idx+1] = \
-            current_list["tasks"][task_idx+1], current_list["tasks"][task_idx]
-        
-        # Swap descriptions
-        current_list["descriptions"][task_idx], current_list["descriptions"][task_idx+1] = \
-            current_list["descriptions"][task_idx+1], current_list["descriptions"][task_idx]
-        
-        lists_data.set(current_data)
-        changes_unsaved.set(True)  # Add this line
-        
-        # Update the selection to follow the moved task
-        ui.update_checkbox_group(
-            "selected_tasks",
-            selected=[str(task_idx + 2)]  # Index is 0-based, but UI is 1-based
-        )    
+        lists_data(input.active_list()).set(current_list.move(task_idx, task_idx + 1))
+        show_position(task_idx + 1)
+        mark_changed()
+        # The selection follows the task because options are keyed by task id    
     
     
     
@@ -354,8 +860,9 @@ def server(input, output, session):
     
     @output
     @render.ui
+    @metrics.rendered
     def unsaved_changes_alert():
-        if changes_unsaved.get():
+        if board.get().unsaved.get():
             
             return ui.div(
                 ui.card(
@@ -373,214 +880,410 @@ def server(input, output, session):
 
 
 
-    @reactive.effect
-    @reactive.event(input.quick_save)
-    def handle_quick_save():
-        if not input.github_token() or not input.github_repo():
-            github_status.set("Please fill in GitHub credentials in the sidebar first")
+    # GitHub calls block, so they run in a worker thread as extended tasks and
+    # the session keeps handling input while a save or load is in flight.
+    # Both carry the board they were started for, in case the session
+    # switches repo before they finish.
+    @reactive.extended_task
+    async def save_task(target, client, lists, archive):
+        saved = await asyncio.to_thread(client.save, lists, LIST_NAMES, archive=archive)
+        await asyncio.to_thread(cache_lists, client, saved)
+        return target, lists, saved, archive
+
+    @reactive.extended_task
+    async def load_task(target, client):
+        loaded, modified = await asyncio.to_thread(client.load, LIST_NAMES)
+        if modified:
+            await asyncio.to_thread(cache_lists, client, loaded)
+        return target, loaded, modified
+
+    # Boards are shared by repo, so a session only joins one, and only loads
+    # or saves through it, once GitHub has confirmed that its token can push
+    # to the repo. with_access(then) calls then(client) with the session's
+    # client when that's done, straight away if it was checked recently.
+    access_waiting = []
+    access_checking = {"client": None}
+
+    @reactive.extended_task
+    async def access_task(client):
+        await asyncio.to_thread(client.check_access)
+        return client
+
+    def github_client():
+        return shared_store.client(input.github_repo(), input.github_token())
+
+    def with_access(then):
+        client = github_client()
+        if client.verified:
+            then(client)
             return
+        access_waiting.append((client, then))
+        if access_task.status() != "running":
+            access_checking["client"] = client
+            access_task.invoke(client)
 
-        path = "ToDoList.txt"
-        try:
-            # Prepare the data
-            data = lists_data.get()
-            formatted_data = ""
-            for list_id, list_name in LIST_NAMES.items():
-                formatted_data += f"=== {list_name} ===\n"
-                list_content = data[list_id]
-                for task, desc in zip(list_content["tasks"], list_content["descriptions"]):
-                    formatted_data += f"- {task}\n"
-                    if desc.strip():
-                        formatted_data += f"  Description: {desc}\n"
-                formatted_data += "\n"
-
-            # GitHub API endpoint
-            repo = input.github_repo()
-            url = f"https://api.github.com/repos/{repo}/contents/{path}"
-
-            # Headers for authentication
-            headers = {
-                "Authorization": f"token {input.github_token()}",
-                "Accept": "application/vnd.github.v3+json"
-            }
-
-            # Check if file exists
-            try:
-                response = requests.get(url, headers=headers)
-                if response.status_code == 200:
-                    # File exists, get the SHA
-                    sha = response.json()["sha"]
+    @reactive.effect
+    @metrics.timed
+    def access_checked():
+        status = access_task.status()
+        if status not in ("success", "error"):
+            return
+        with reactive.isolate():
+            checked = access_checking["client"]
+            if status == "error":
+                shared_store.forget(checked)
+                error = access_task.error.get()
+                if not isinstance(error, GitHubError):
+                    github_status.set(f"Error: {str(error)}")
+                elif error.status_code == 403:
+                    github_status.set("This token can't push to the repository")
                 else:
-                    sha = None
-            except:
-                sha = None
+                    github_status.set(f"Can't open the repository with this token ({error.status_code})")
+            waiting = list(access_waiting)
+            access_waiting.clear()
+            for client, then in waiting:
+                if client.verified:
+                    then(client)
+                elif client is not checked:
+                    # Asked for with other credentials while this check ran
+                    access_waiting.append((client, then))
+            if access_waiting:
+                access_checking["client"] = access_waiting[-1][0]
+                access_task.invoke(access_checking["client"])
+
+    def start_load(client):
+        target = attach_board(client)
+        load_task.invoke(target, client)
+
+    def sync_running():
+        return save_task.status() == "running" or load_task.status() == "running"
+
+    def start_save(missing_message):
+        if not input.github_token() or not input.github_repo():
+            github_status.set(missing_message)
+            return
+        if save_task.status() == "running":
+            github_status.set("A save is already in progress")
+            return
 
-            # Prepare the content
-            content = base64.b64encode(formatted_data.encode()).decode()
+        github_status.set("Saving to GitHub...")
 
-            # Prepare the data for the API request
-            data = {
-                "message": "Update task lists",
-                "content": content,
-            }
-            if sha:
-                data["sha"] = sha
+        def save(client):
+            if save_task.status() == "running":
+                return
+            target = attach_board(client)
+            target.auto_saver.flushed()
+            lists = target.get_all()
+            save_task.invoke(target, client, lists, target.archive_to_save(lists))
 
-            # Make the API request
-            response = requests.put(url, headers=headers, json=data)
+        with_access(save)
 
-            if response.status_code in [200, 201]:
-                github_status.set("Successfully saved to GitHub!")
-                changes_unsaved.set(False)
-            else:
-                github_status.set(f"Error saving to GitHub: {response.status_code}")
+    @reactive.effect
+    @reactive.event(input.quick_save)
+    @metrics.timed
+    def handle_quick_save():
+        start_save("Please fill in GitHub credentials in the sidebar first")
 
-        except Exception as e:
-            github_status.set(f"Error: {str(e)}")
-    
-    
-    
-    
-    
-    
-    
     @reactive.effect
     @reactive.event(input.save_github)
+    @metrics.timed
     def save_to_github():
-        path= "ToDoList.txt"
+        start_save("Please fill in all GitHub fields")
+
+    @reactive.effect
+    @reactive.event(input.load_github)      
+    @metrics.timed
+    def load_from_github():
         if not input.github_token() or not input.github_repo():
             github_status.set("Please fill in all GitHub fields")
             return
+        if load_task.status() == "running":
+            github_status.set("A load is already in progress")
+            return
 
-        try:
-            # Prepare the data
-            data = lists_data.get()
-            formatted_data = ""
-            for list_id, list_name in LIST_NAMES.items():
-                formatted_data += f"=== {list_name} ===\n"
-                list_content = data[list_id]
-                for task, desc in zip(list_content["tasks"], list_content["descriptions"]):
-                    formatted_data += f"- {task}\n"
-                    if desc.strip():
-                        formatted_data += f"  Description: {desc}\n"
-                formatted_data += "\n"
-
-            # GitHub API endpoint
-            repo = input.github_repo()
-            
-            url = f"https://api.github.com/repos/{repo}/contents/{path}"
-
-            # Headers for authentication
-            headers = {
-                "Authorization": f"token {input.github_token()}",
-                "Accept": "application/vnd.github.v3+json"
-            }
-
-            # Check if file exists
-            try:
-                response = requests.get(url, headers=headers)
-                if response.status_code == 200:
-                    # File exists, get the SHA
-                    sha = response.json()["sha"]
-                else:
-                    sha = None
-            except:
-                sha = None
+        github_status.set("Loading from GitHub...")
+        with_access(start_load)
 
-            # Prepare the content
-            content = base64.b64encode(formatted_data.encode()).decode()
+    @reactive.effect
+    @metrics.timed
+    def auto_save():
+        # Re-runs on every edit, when its timer fires and when a save finishes
+        current = board.get()
+        current.edit_count.get()
+        if not input.auto_save() or save_task.status() == "running":
+            return
+        if not input.github_token() or not input.github_repo():
+            return
 
-            # Prepare the data for the API request
-            data = {
-                "message": "Update task lists",
-                "content": content,
-            }
-            if sha:
-                data["sha"] = sha
+        wait = current.auto_saver.seconds_until_due()
+        if wait is None:
+            return
+        if wait > 0:
+            reactive.invalidate_later(wait)
+            return
+        with reactive.isolate():
+            start_save("Please fill in GitHub credentials in the sidebar first")
 
-            # Make the API request
-            response = requests.put(url, headers=headers, json=data)
+    @reactive.effect
+    @reactive.event(input.cancel_sync)
+    @metrics.timed
+    def cancel_sync():
+        # Stops waiting for the result; a request already sent still finishes
+        save_task.cancel()
+        load_task.cancel()
 
-            if response.status_code in [200, 201]:
+    @reactive.effect
+    @metrics.timed
+    def save_finished():
+        status = save_task.status()
+        with reactive.isolate():
+            if status == "success":
+                target, sent, saved, archived = save_task.value.get()
+                target.loaded = True
+                target.synced = saved
+                target.archive_saved(archived)
                 github_status.set("Successfully saved to GitHub!")
-            else:
-                github_status.set(f"Error saving to GitHub: {response.status_code}")
+                if saved is not sent:
+                    # Someone else saved first and their edits were merged in.
+                    # Bring them onto the board, keeping edits made here since.
+                    current = target.get_all()
+                    merged = merge_lists(sent, current, saved)
+                    target.set_all({
+                        list_id: tasks for list_id, tasks in merged.items()
+                        if tasks is not current[list_id]
+                    })
+                    target.record()
+                    github_status.set("Saved to GitHub, merged with changes saved elsewhere")
+                # Edits made while the save was in flight are still unsaved
+                if all(target.lists[list_id].get() is saved[list_id] for list_id in LIST_NAMES):
+                    target.unsaved.set(False)
+                target.publish()
+            elif status == "error":
+                error = save_task.error.get()
+                if isinstance(error, GitHubError):
+                    github_status.set(f"Error saving to GitHub: {error.status_code}")
+                else:
+                    github_status.set(f"Error: {str(error)}")
+            elif status == "cancelled":
+                github_status.set("Stopped waiting; the save may still complete on GitHub")
+
+    @reactive.effect
+    @metrics.timed
+    def load_finished():
+        status = load_task.status()
+        with reactive.isolate():
+            if status == "success":
+                restored_from_cache.set(False)
+                target, loaded, modified = load_task.value.get()
+                current = target.get_all()
+                merged = loaded
+                if target.unsaved.get():
+                    # Other sessions on the board have edits that aren't saved
+                    # yet: keep them, merged with what came from GitHub
+                    merged = merge_lists(target.synced, current, loaded)
+                # Update the board for every session on it; a list that is
+                # still the same object (e.g. after a 304) doesn't invalidate anything
+                target.set_all({
+                    list_id: tasks for list_id, tasks in merged.items()
+                    if tasks is not current[list_id]
+                })
+                target.synced = loaded
+                target.loaded = True
+                # A load can be undone like an edit
+                target.record()
+                target.publish()
+                if modified:
+                    github_status.set("Successfully loaded from GitHub!")
+                else:
+                    github_status.set("Loaded from GitHub (no changes since last load)")
+            elif status == "error":
+                error = load_task.error.get()
+                if isinstance(error, GitHubError):
+                    github_status.set(f"Error loading from GitHub: {error.status_code}")
+                else:
+                    github_status.set(f"Error loading: {str(error)}")
+            elif status == "cancelled":
+                github_status.set("Stopped waiting for the load")
+
+    @output
+    @render.text
+    @metrics.rendered
+    def github_queue_output():
+        # The scheduler's state changes in worker threads, so poll it while
+        # anything is in flight
+        token = input.github_token()
+        if not token:
+            return ""
+        pending, retry_in = scheduler.status(token)
+        if pending or sync_running():
+            reactive.invalidate_later(0.5)
+        parts = []
+        if pending:
+            parts.append(f"{pending} GitHub request{'s' if pending != 1 else ''} queued")
+        if retry_in is not None:
+            parts.append(f"next retry in {retry_in:.0f}s")
+        return " · ".join(parts)
+
+    @output
+    @render.ui
+    @metrics.rendered
+    def github_sync_controls():
+        if not sync_running():
+            return ui.div()
+        return ui.input_action_button("cancel_sync", "Cancel", class_="btn-secondary btn-sm")
 
-        except Exception as e:
-            github_status.set(f"Error: {str(e)}")
+    # Local persistence: the browser keeps a snapshot in localStorage (see
+    # www/script.js) and the server optionally keeps one per repo and token in SQLite.
+    # Cached lists show immediately and are then revalidated against GitHub.
+    restored_from_cache = reactive.value(False)
+    storage_checked = reactive.value(False)
+    # When we last wrote to the browser and what it holds: the lists and
+    # meta sent, and each list's encoded size as of `measured`
+    last_browser_write = {"at": 0.0, "sent": {}, "meta": None, "measured": {}, "sizes": {}, "cleared": False}
+    revalidate_pending = {"key": None, "since": 0.0}
+    join_pending = {"key": None, "since": 0.0}
 
+    def board_is_empty():
+        return board.get().is_empty()
 
+    def restore_snapshot(payload, source):
+        try:
+            lists, meta = load_snapshot(payload, LIST_NAMES)
+        except (ValueError, KeyError, TypeError):
+            return None
+        board.get().set_all(lists)
+        if meta.get("unsaved"):
+            mark_changed()
+        else:
+            board.get().record()
+            board.get().publish()
+        restored_from_cache.set(True)
+        github_status.set(f"Showing tasks from the {source} cache")
+        return meta
 
     @reactive.effect
-    @reactive.event(input.load_github)      
-    def load_from_github():
-        path = "ToDoList.txt"
-        if not input.github_token() or not input.github_repo():
-            github_status.set("Please fill in all GitHub fields")
+    @reactive.event(input.storage_data)
+    @metrics.timed
+    def restore_from_browser():
+        storage_checked.set(True)
+        if not input.storage_data() or not board_is_empty():
             return
+        meta = restore_snapshot(input.storage_data(), "browser")
+        if meta and meta.get("repo") and not input.github_repo():
+            ui.update_text("github_repo", value=meta["repo"])
 
-        try:
-            # GitHub API endpoint
-            repo = input.github_repo()
-            url = f"https://api.github.com/repos/{repo}/contents/{path}"
+    @reactive.effect
+    @metrics.timed
+    def join_shared_board():
+        # Show a board other sessions already have on this repo, or the
+        # server cache, without a load; only once the token has access
+        key = (input.github_repo(), input.github_token())
+        if not all(key):
+            return
+        with reactive.isolate():
+            if board.get().repo == key[0] or not board_is_empty():
+                return
+        # Wait for the credentials to settle so we don't check half a token
+        now = time.monotonic()
+        if key != join_pending["key"]:
+            join_pending.update(key=key, since=now)
+        wait = join_pending["since"] + 1.0 - now
+        if wait > 0:
+            reactive.invalidate_later(wait)
+            return
 
-            # Headers for authentication
-            headers = {
-                "Authorization": f"token {input.github_token()}",
-                "Accept": "application/vnd.github.v3+json"
-            }
+        def join(client):
+            if board.get().repo == client.repo or not board_is_empty():
+                return
+            if shared_store.find_loaded(client):
+                attach_board(client)
+                github_status.set("Showing tasks shared with other sessions")
+                return
+            payload = local_cache.get(client.repo, client.token) if local_cache is not None else None
+            if payload:
+                attach_board(client)
+                if board_is_empty():
+                    restore_snapshot(payload, "server")
 
-            # Get the file content
-            response = requests.get(url, headers=headers)
-            
-            if response.status_code == 200:
-                # Decode content from base64
-                content = base64.b64decode(response.json()["content"]).decode()
-                
-                # Parse the content
-                current_list_id = None
-                new_data = {list_id: {"tasks": [], "descriptions": []} 
-                        for list_id in LIST_NAMES.keys()}
-                
-                lines = [line.rstrip() for line in content.split('\n')]
-                i = 0
-                while i < len(lines):
-                    line = lines[i]
-                    if not line:
-                        i += 1
-                        continue
-                        
-                    # Check if this is a list header
-                    if line.startswith('===') and line.endswith('==='):
-                        list_name = line.strip('= ')
-                        # Find the list_id for this list_name
-                        current_list_id = next(
-                            (k for k, v in LIST_NAMES.items() if v == list_name),
-                            None
-                        )
-                    # Check if this is a task
-                    elif line.startswith('- ') and current_list_id:
-                        task = line[2:]  # Remove the '- ' prefix
-                        new_data[current_list_id]["tasks"].append(task)
-                        
-                        # Look ahead for description
-                        desc = ""
-                        if i + 1 < len(lines):
-                            next_line = lines[i + 1]
-                            if next_line.startswith('  Description:'):
-                                desc = next_line[14:].strip()  # Remove '  Description: ' prefix
-                                i += 1  # Skip the description line
-                        new_data[current_list_id]["descriptions"].append(desc)
-                    
-                    i += 1
-
-                # Update the lists_data
-                lists_data.set(new_data)
-                github_status.set("Successfully loaded from GitHub!")
-            else:
-                github_status.set(f"Error loading from GitHub: {response.status_code}")
+        with reactive.isolate():
+            with_access(join)
+
+    @reactive.effect
+    @metrics.timed
+    def revalidate_cached():
+        if not restored_from_cache.get():
+            return
+        key = (input.github_repo(), input.github_token())
+        if not all(key):
+            return
+        with reactive.isolate():
+            if board.get().unsaved.get():
+                # Local edits win; they reach GitHub on the next save
+                restored_from_cache.set(False)
+                return
+            if load_task.status() == "running":
+                return
+
+        # Wait for the credentials to settle so we don't fetch with half a token
+        now = time.monotonic()
+        if key != revalidate_pending["key"]:
+            revalidate_pending.update(key=key, since=now)
+        wait = revalidate_pending["since"] + 1.0 - now
+        if wait > 0:
+            reactive.invalidate_later(wait)
+            return
+
+        with reactive.isolate():
+            restored_from_cache.set(False)
+            github_status.set("Checking GitHub for newer tasks...")
+            with_access(start_load)
 
-        except Exception as e:
-            github_status.set(f"Error loading: {str(e)}")
+    @reactive.effect
+    @metrics.timed
+    async def persist_to_browser():
+        lists = get_all_lists()
+        unsaved = board.get().unsaved.get()
+        # Don't overwrite the stored snapshot before we've had a chance to read it
+        if not storage_checked.get():
+            return
+        wait = last_browser_write["at"] + 2.0 - time.monotonic()
+        if wait > 0:
+            reactive.invalidate_later(wait)
+            return
+        last_browser_write["at"] = time.monotonic()
+        with reactive.isolate():
+            repo = input.github_repo()
+        # Never store the token in the browser
+        meta = {"repo": repo, "unsaved": unsaved}
+        stored = last_browser_write
+        for list_id, tasks in lists.items():
+            previous = stored["measured"].get(list_id)
+            if tasks is not previous:
+                # Only the tasks that changed since the last measure
+                removed, added = tasks.diff(previous or TaskList())
+                stored["sizes"][list_id] = (
+                    stored["sizes"].get(list_id, 0)
+                    + sum(map(snapshot_size, added)) - sum(map(snapshot_size, removed))
+                )
+                stored["measured"][list_id] = tasks
+        if sum(stored["sizes"].values()) > BROWSER_SNAPSHOT_LIMIT:
+            # Too big for localStorage: drop the stale snapshot rather than
+            # restore it over newer tasks later
+            if not stored["cleared"]:
+                await session.send_custom_message("save_to_storage", {"clear": True})
+                stored.update(sent={}, meta=None, cleared=True)
+            return
+        # Only the lists that changed since the last write; script.js keeps the rest
+        changed = {
+            list_id: tasks for list_id, tasks in lists.items()
+            if tasks is not stored["sent"].get(list_id)
+        }
+        if not changed and meta == stored["meta"]:
+            return
+        await session.send_custom_message("save_to_storage", {
+            "snapshot": dump_snapshot(changed, **meta),
+            "complete": not stored["sent"]
+        })
+        stored.update(sent=dict(lists), meta=meta, cleared=False)
 
-app = App(app_ui, server)
+app = metrics.mount(App(app_ui, server, static_assets=Path(__file__).parent / "www"))
@@ -0,0 +1,39 @@
+"""Debounce logic for write-behind auto-save.
+
+A burst of edits is flushed once the edits have been quiet for
+`quiet_period` seconds, or `max_latency` seconds after the first unsaved
+edit, whichever comes first.
+"""
+import time
+
+
+class AutoSaveScheduler:
+    def __init__(self, quiet_period=5.0, max_latency=60.0, clock=time.monotonic):
+        self.quiet_period = quiet_period
+        self.max_latency = max_latency
+        self.clock = clock
+        self.first_change = None
+        self.last_change = None
+
+    def touch(self):
+        now = self.clock()
+        if self.first_change is None:
+            self.first_change = now
+        self.last_change = now
+
+    def pending(self):
+        return self.first_change is not None
+
+    def seconds_until_due(self):
+        if self.first_change is None:
+            return None
+        deadline = min(
+            self.last_change + self.quiet_period,
+            self.first_change + self.max_latency
+        )
+        return max(0.0, deadline - self.clock())
+
+    def flushed(self):
+        # Edits made after this point start a new burst
+        self.first_change = None
+        self.last_change = None
@@ -0,0 +1,59 @@
+"""Round-trip benchmark for the ToDoList.txt codec.
+
+    python benchmarks/bench_codec.py [--tasks 100000]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import LIST_NAMES  # noqa: E402
+from task_store import Task, TaskList  # noqa: E402
+from todo_codec import encode_lists, iter_chunks, parse_stream  # noqa: E402
+
+
+def make_lists(count):
+    list_ids = list(LIST_NAMES)
+    tasks = {list_id: [] for list_id in list_ids}
+    for i in range(count):
+        description = f"Details for task {i}" if i % 3 else ""
+        tasks[list_ids[i % len(list_ids)]].append(Task(f"Task number {i}", description))
+    return {list_id: TaskList(items) for list_id, items in tasks.items()}
+
+
+def measure(label, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<24} {elapsed * 1000:10.1f} ms {peak / 2**20:10.1f} MiB peak")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=100_000)
+    args = parser.parse_args()
+
+    lists = make_lists(args.tasks)
+    print(f"{args.tasks} tasks across {len(LIST_NAMES)} lists")
+
+    measure("stream chunks", lambda: sum(len(chunk) for chunk in iter_chunks(lists, LIST_NAMES)))
+    data = measure("encode", lambda: encode_lists(lists, LIST_NAMES))
+    parsed = measure("parse byte stream", lambda: parse_stream(io.BytesIO(data), LIST_NAMES))
+
+    for list_id in LIST_NAMES:
+        before = [(t.title, t.description) for t in lists[list_id]]
+        after = [(t.title, t.description) for t in parsed[list_id]]
+        assert before == after, f"round trip mismatch in {list_id}"
+    print(f"round trip ok, {len(data) / 2**20:.1f} MiB document")
+
+
+if __name__ == "__main__":
+    main()
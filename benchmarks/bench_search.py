@@ -0,0 +1,92 @@
+"""Benchmark for the task search index.
+
+    python benchmarks/bench_search.py [--tasks 100000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import LIST_NAMES  # noqa: E402
+from search_index import SearchIndex  # noqa: E402
+from task_store import Task, TaskList  # noqa: E402
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def make_words(count, rng):
+    return ["".join(rng.choices(LETTERS, k=rng.randint(3, 9))) for _ in range(count)]
+
+
+def make_lists(count, rng):
+    # Word frequencies follow Zipf's law, roughly as in real text
+    words = make_words(20_000, rng)
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    list_ids = list(LIST_NAMES)
+    tasks = {list_id: [] for list_id in list_ids}
+    for i in range(count):
+        title = " ".join(rng.choices(words, weights, k=4))
+        description = " ".join(rng.choices(words, weights, k=8)) if i % 3 else ""
+        tasks[list_ids[i % len(list_ids)]].append(Task(title, description))
+    return {list_id: TaskList(items) for list_id, items in tasks.items()}, words
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    lists, words = make_lists(args.tasks, rng)
+    print(f"{args.tasks} tasks across {len(LIST_NAMES)} lists")
+
+    index = SearchIndex()
+    print(f"{'initial build':<24} {timed(lambda: index.sync(lists), 1):10.1f} ms")
+
+    queries = [rng.choice(words) for _ in range(args.repeat)]
+    prefixes = [word[:3] for word in queries]
+    pairs = [f"{a} {b[:4]}" for a, b in zip(queries, reversed(queries))]
+    for label, batch in (("word query", queries), ("prefix query", prefixes), ("two-term query", pairs)):
+        batch = iter(batch)
+        print(f"{label:<24} {timed(lambda: index.search(next(batch)), args.repeat):10.3f} ms")
+
+    # One edit per sync, as the app does after each change
+    list_ids = list(LIST_NAMES)
+
+    def edit():
+        list_id = rng.choice(list_ids)
+        tasks = lists[list_id]
+        position = rng.randrange(len(tasks))
+        lists[list_id] = tasks.replace(position, tasks[position].replace(title=rng.choice(words)))
+        index.sync(lists)
+
+    def move():
+        source, target = rng.sample(list_ids, 2)
+        position = rng.randrange(len(lists[source]))
+        task = lists[source][position]
+        lists[source] = lists[source].delete(position)
+        lists[target] = lists[target].append(task)
+        index.sync(lists)
+
+    print(f"{'edit + sync':<24} {timed(edit, args.repeat):10.3f} ms")
+    print(f"{'cross-list move + sync':<24} {timed(move, args.repeat):10.3f} ms")
+
+    rebuilt = SearchIndex()
+    rebuilt.sync(lists)
+    assert rebuilt.postings == index.postings, "incremental index drifted from a rebuild"
+    print("incremental index matches a rebuild")
+
+
+if __name__ == "__main__":
+    main()
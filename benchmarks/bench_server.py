@@ -0,0 +1,247 @@
+"""Headless benchmark for app.server.
+
+Connects to the app in-process over Shiny's websocket protocol (starlette's
+TestClient, no browser), points github_sync at benchmarks/fake_github.py and
+replays a trace of user actions against a repo seeded with each size. For
+every action it reports the time until the last message the server sends in
+response, the bytes sent to the browser and the peak memory traced while it
+ran.
+
+    python benchmarks/bench_server.py [--sizes 1000,10000,100000]
+        [--latency 50] [--json results.json] [--no-memory]
+
+Memory tracing slows Python down noticeably; compare timings from runs with
+the same setting. The session's throttled localStorage snapshot is counted
+in whichever action it happens to follow. --json writes the rows so two
+runs can be diffed.
+"""
+import argparse
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+# starlette warns about its httpx-based test client on import
+warnings.filterwarnings("ignore", message=".*httpx")
+
+from starlette.testclient import TestClient  # noqa: E402
+
+import app  # noqa: E402
+import fake_github  # noqa: E402
+import github_sync  # noqa: E402
+from task_store import Task  # noqa: E402
+from todo_codec import encode_list  # noqa: E402
+
+# A response is complete once the server has gone idle and then been quiet
+# for this long
+QUIET_PERIOD = 0.1
+TIMEOUT = 120
+
+OUTPUTS = [
+    "task_selector", "edit_controls", "move_controls", "task_lists_display",
+    "unsaved_changes_alert", "github_status_output", "github_sync_controls",
+    "search_results", "import_status_output"
+] + [f"list_card_{list_id}" for list_id in app.LIST_NAMES]
+
+
+class BrowserSession:
+    """One Shiny session, driven the way the browser would drive it."""
+
+    def __init__(self, client, **inputs):
+        self._context = client.websocket_connect("/websocket/")
+        self.ws = self._context.__enter__()
+        self.values = {}
+        self.counters = {}
+        self.messages = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+        init = {
+            "active_list": "list1",
+            "display_lists": ["list1", "list2"],
+            "task": "",
+            "description": "",
+            "search": "",
+            "github_repo": "",
+            "github_token": "",
+            "auto_save": False,
+            "storage_data": "",
+            ".clientdata_url_search": ""
+        }
+        init.update({f".clientdata_output_{name}_hidden": False for name in OUTPUTS})
+        init.update(inputs)
+        self.send({"method": "init", "data": init})
+
+    def _read(self):
+        try:
+            while True:
+                text = self.ws.receive_text()
+                self.messages.put((time.perf_counter(), text))
+        except Exception:
+            pass
+
+    def send(self, message, until=None):
+        # Returns (seconds to the last reply, bytes received). With `until`,
+        # keeps waiting until that predicate on the output values holds.
+        started = time.perf_counter()
+        self.ws.send_text(json.dumps(message))
+        last = started
+        received = 0
+        idle = False
+        deadline = started + TIMEOUT
+        while True:
+            done = idle and (until is None or until(self.values))
+            try:
+                at, text = self.messages.get(timeout=QUIET_PERIOD if done else max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                if done:
+                    return last - started, received
+                raise TimeoutError(f"no reply to {message['method']} within {TIMEOUT}s")
+            last = at
+            received += len(text.encode())
+            reply = json.loads(text)
+            if reply.get("busy") == "idle":
+                idle = True
+            for name, value in reply.get("values", {}).items():
+                self.values[name] = value.get("html") if isinstance(value, dict) else value
+            if reply.get("errors"):
+                raise RuntimeError(f"output errors: {reply['errors']}")
+
+    def update(self, until=None, **inputs):
+        return self.send({"method": "update", "data": inputs}, until)
+
+    def click(self, button, until=None, **inputs):
+        self.counters[button] = self.counters.get(button, 0) + 1
+        inputs[f"{button}:shiny.action"] = self.counters[button]
+        return self.update(until, **inputs)
+
+    def status(self):
+        return self.values.get("github_status_output") or ""
+
+    def visible_task_ids(self):
+        return re.findall(r'data-task-id="([0-9a-f]+)"', self.values.get("list_card_list1") or "")
+
+    def close(self):
+        self._context.__exit__(None, None, None)
+
+
+def status_is(*prefixes):
+    return lambda values: (values.get("github_status_output") or "").startswith(prefixes)
+
+
+def trace(session, size):
+    # (action, callable) pairs, replayed in order
+    paste = "\n".join(f"Imported task {i}" for i in range(1000))
+
+    def select_first():
+        return session.update(selected_tasks=session.visible_task_ids()[:1])
+
+    return [
+        ("load", lambda: session.click("load_github", until=status_is("Successfully loaded", "Error"))),
+        ("add task", lambda: session.click("add", task=f"Benchmark task {size}", description="added")),
+        ("next page", lambda: session.click("card_list1_next")),
+        ("previous page", lambda: session.click("card_list1_prev")),
+        ("search", lambda: session.update(search="task 12")),
+        ("clear search", lambda: session.update(search="")),
+        ("select task", select_first),
+        ("edit task", lambda: session.click("start_edit")),
+        ("save edit", lambda: session.click("save_edit", edit_task="Edited title", edit_description="edited")),
+        ("move down", lambda: session.click("move_down")),
+        ("move to bottom", lambda: session.click("move_bottom")),
+        ("move to top", lambda: session.click("move_top")),
+        ("move to list", lambda: session.click("move_tasks", move_to_list="list2")),
+        ("import 1000", lambda: session.click("import_pasted", import_text=paste, import_format="txt")),
+        ("save", lambda: session.click("quick_save", until=status_is("Successfully saved", "Error"))),
+        ("reload unchanged", lambda: session.click("load_github", until=status_is("Loaded from GitHub", "Error"))),
+    ]
+
+
+def seed(repo, size):
+    list_ids = list(app.LIST_NAMES)
+    tasks = {list_id: [] for list_id in list_ids}
+    for i in range(size):
+        # Most tasks go in the first list, so it is the one that grows
+        list_id = list_ids[0] if i % 2 else list_ids[i // 2 % len(list_ids)]
+        tasks[list_id].append(Task(f"Task number {i}", f"Details for task {i}" if i % 3 else ""))
+    repo.write_files({
+        github_sync.list_path(list_id): encode_list(app.LIST_NAMES[list_id], items)
+        for list_id, items in tasks.items()
+    }, "seed")
+
+
+def run_size(client, size, latency, trace_memory):
+    repo, url = fake_github.start(latency=latency)
+    github_sync.API_URL = url
+    seed(repo, size)
+
+    rows = []
+    session = BrowserSession(client, github_repo=f"bench/size-{size}", github_token="token")
+    try:
+        for action, run in trace(session, size):
+            if trace_memory:
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+            calls = len(repo.calls)
+            elapsed, received = run()
+            row = {
+                "size": size,
+                "action": action,
+                "ms": round(elapsed * 1000, 1),
+                "bytes": received,
+                "github_calls": len(repo.calls) - calls
+            }
+            if trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                row["peak_mib"] = round((peak - before) / 2**20, 2)
+                row["retained_mib"] = round((current - before) / 2**20, 2)
+            rows.append(row)
+            print_row(row)
+        if not session.status().startswith("Loaded from GitHub"):
+            raise RuntimeError(f"trace ended with status {session.status()!r}")
+    finally:
+        session.close()
+    return rows
+
+
+def print_row(row):
+    memory = ""
+    if "peak_mib" in row:
+        memory = f" {row['peak_mib']:9.2f} {row['retained_mib']:9.2f}"
+    print(
+        f"{row['size']:>7} {row['action']:<18} {row['ms']:9.1f} "
+        f"{row['bytes'] / 1024:10.1f} {row['github_calls']:6}{memory}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--latency", type=float, default=50, help="fake GitHub latency per request, ms")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc")
+    args = parser.parse_args()
+
+    trace_memory = not args.no_memory
+    if trace_memory:
+        tracemalloc.start()
+    header = f"{'tasks':>7} {'action':<18} {'ms':>9} {'KiB sent':>10} {'calls':>6}"
+    if trace_memory:
+        header += f" {'peak MiB':>9} {'kept MiB':>9}"
+    print(header)
+
+    rows = []
+    with TestClient(app.app) as client:
+        for size in (int(size) for size in args.sizes.split(",")):
+            rows.extend(run_size(client, size, args.latency / 1000, trace_memory))
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump({"latency_ms": args.latency, "rows": rows}, out, indent=1)
+
+
+if __name__ == "__main__":
+    main()
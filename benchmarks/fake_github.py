@@ -0,0 +1,283 @@
+"""Local stand-in for the parts of the GitHub REST API the app uses.
+
+Implements repo info, refs (with ETags), commits, trees and blobs from the
+Git Data API plus GET and PUT on the contents API, over a real HTTP server
+on 127.0.0.1, so github_sync runs unmodified against it:
+
+    repo, url = fake_github.start(latency=0.05)
+    github_sync.API_URL = url
+
+Every request sleeps for `repo.latency` seconds first and is recorded in
+`repo.calls`. repo.fail_next() makes the next requests fail, e.g. with a
+rate-limit response. FakeRepo(empty=True) starts without any commit; like
+GitHub, it then refuses Git Data writes with 409 until the contents API
+makes the first one. FakeRepo(tokens={token: "push" or "pull"}) makes it
+private: other tokens get 404 for everything, and only "push" tokens may
+write. The owner/repo part of the URL is ignored.
+"""
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def git_sha(kind, data):
+    return hashlib.sha1(b"%s %d\0" % (kind.encode(), len(data)) + data).hexdigest()
+
+
+class FakeRepo:
+    def __init__(self, branch="main", latency=0.0, empty=False, tokens=None):
+        self.lock = threading.Lock()
+        # sha -> (kind, object): blobs are bytes, trees {name: (kind, sha)},
+        # commits {"tree", "parents", "message"}
+        self.objects = {}
+        self.branch = branch
+        self.latency = latency
+        # None: a public repo every token can push to
+        self.tokens = tokens
+        self.calls = []
+        # (status, headers) answers to give instead of handling requests
+        self.failures = []
+        self.refs = {} if empty else {branch: self.put_commit(self.put_tree({}), [], "init")}
+
+    def put_blob(self, data):
+        sha = git_sha("blob", data)
+        self.objects[sha] = ("blob", data)
+        return sha
+
+    def put_tree(self, entries):
+        sha = git_sha("tree", json.dumps(sorted(entries.items())).encode())
+        self.objects[sha] = ("tree", dict(entries))
+        return sha
+
+    def put_commit(self, tree, parents, message):
+        sha = git_sha("commit", json.dumps([tree, parents, message, time.time()]).encode())
+        self.objects[sha] = ("commit", {"tree": tree, "parents": parents, "message": message})
+        return sha
+
+    def tree_of(self, sha):
+        kind, obj = self.objects[sha]
+        return obj["tree"] if kind == "commit" else sha
+
+    def write_path(self, tree_sha, parts, blob):
+        # New tree with `parts` pointing at `blob` (or removed when None)
+        entries = dict(self.objects[tree_sha][1]) if tree_sha else {}
+        name = parts[0]
+        if len(parts) == 1:
+            if blob is None:
+                entries.pop(name, None)
+            else:
+                entries[name] = ("blob", blob)
+        else:
+            subtree = entries.get(name, ("tree", None))[1]
+            entries[name] = ("tree", self.write_path(subtree, parts[1:], blob))
+        return self.put_tree(entries)
+
+    def read_path(self, path):
+        if self.branch not in self.refs:
+            return None
+        tree = self.tree_of(self.refs[self.branch])
+        *dirs, name = path.split("/")
+        for directory in dirs:
+            entry = self.objects[tree][1].get(directory)
+            if not entry:
+                return None
+            tree = entry[1]
+        entry = self.objects[tree][1].get(name)
+        return self.objects[entry[1]][1] if entry else None
+
+    def fail_next(self, status, times=1, headers=None):
+        self.failures.extend([(status, headers or {})] * times)
+
+    def write_files(self, files, message="external edit"):
+        # Commit {path: bytes or None} as another client would
+        with self.lock:
+            head = self.refs[self.branch]
+            tree = self.tree_of(head)
+            for path, data in files.items():
+                blob = None if data is None else self.put_blob(data)
+                tree = self.write_path(tree, path.split("/"), blob)
+            self.refs[self.branch] = self.put_commit(tree, [head], message)
+
+    def write_file(self, path, data, message="external edit"):
+        self.write_files({path: data}, message)
+
+
+def _make_handler(repo):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def send(self, code, body=None, headers=()):
+            data = json.dumps(body).encode() if body is not None else b""
+            self.send_response(code)
+            for key, value in headers:
+                self.send_header(key, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length)) if length else {}
+
+        def route(self, method):
+            time.sleep(repo.latency)
+            path = re.sub(r"^/repos/[^/]+/[^/]+", "", self.path)
+            repo.calls.append((method, path))
+            with repo.lock:
+                if repo.failures:
+                    status, headers = repo.failures.pop(0)
+                    self.body()
+                    return self.send(status, {"message": "Injected failure"}, headers.items())
+                self.dispatch(method, path)
+
+        def dispatch(self, method, path):
+            access = "push"
+            if repo.tokens is not None:
+                token = (self.headers.get("Authorization") or "").partition(" ")[2]
+                access = repo.tokens.get(token)
+                if access is None:
+                    self.body()
+                    return self.send(404, {"message": "Not Found"})
+                if method != "GET" and access != "push":
+                    self.body()
+                    return self.send(403, {"message": "Resource not accessible by personal access token"})
+
+            if method == "GET" and path == "":
+                return self.send(200, {
+                    "default_branch": repo.branch,
+                    "permissions": {"pull": True, "push": access == "push", "admin": False}
+                })
+
+            if not repo.refs and (method == "GET" and path.startswith("/git/") or method == "POST"):
+                return self.send(409, {"message": "Git Repository is empty."})
+
+            match = re.fullmatch(r"/git/ref/heads/(.+)", path)
+            if method == "GET" and match:
+                sha = repo.refs.get(match.group(1))
+                if sha is None:
+                    return self.send(404, {"message": "Not Found"})
+                etag = f'"{sha}"'
+                if self.headers.get("If-None-Match") == etag:
+                    return self.send(304)
+                return self.send(200, {"object": {"sha": sha, "type": "commit"}}, [("ETag", etag)])
+
+            match = re.fullmatch(r"/git/commits/(\w+)", path)
+            if method == "GET" and match:
+                commit = repo.objects[match.group(1)][1]
+                return self.send(200, {
+                    "sha": match.group(1),
+                    "tree": {"sha": commit["tree"]},
+                    "parents": [{"sha": parent} for parent in commit["parents"]]
+                })
+
+            match = re.fullmatch(r"/git/trees/(\w+)", path)
+            if method == "GET" and match:
+                sha = repo.tree_of(match.group(1))
+                entries = [
+                    {"path": name, "type": kind, "sha": entry_sha,
+                     "mode": "040000" if kind == "tree" else "100644"}
+                    for name, (kind, entry_sha) in sorted(repo.objects[sha][1].items())
+                ]
+                return self.send(200, {"sha": sha, "tree": entries})
+
+            match = re.fullmatch(r"/git/blobs/(\w+)", path)
+            if method == "GET" and match:
+                data = repo.objects[match.group(1)][1]
+                return self.send(200, {
+                    "sha": match.group(1),
+                    "encoding": "base64",
+                    "content": base64.b64encode(data).decode(),
+                    "size": len(data)
+                })
+
+            match = re.fullmatch(r"/contents/(.+)", path)
+            if method == "GET" and match:
+                data = repo.read_path(match.group(1))
+                if data is None:
+                    return self.send(404, {"message": "Not Found"})
+                return self.send(200, {
+                    "sha": git_sha("blob", data),
+                    "content": base64.b64encode(data).decode()
+                })
+            if method == "PUT" and match:
+                body = self.body()
+                branch = body.get("branch", repo.branch)
+                head = repo.refs.get(branch)
+                if head and repo.read_path(match.group(1)) is not None and "sha" not in body:
+                    return self.send(422, {"message": "\"sha\" wasn't supplied."})
+                blob = repo.put_blob(base64.b64decode(body["content"]))
+                tree = repo.write_path(repo.tree_of(head) if head else None, match.group(1).split("/"), blob)
+                repo.refs[branch] = repo.put_commit(tree, [head] if head else [], body["message"])
+                return self.send(201, {"commit": {"sha": repo.refs[branch]}})
+
+            if method == "POST" and path == "/git/blobs":
+                body = self.body()
+                if body.get("encoding") == "base64":
+                    data = base64.b64decode(body["content"])
+                else:
+                    data = body["content"].encode()
+                return self.send(201, {"sha": repo.put_blob(data)})
+
+            if method == "POST" and path == "/git/trees":
+                body = self.body()
+                tree = body.get("base_tree")
+                for entry in body["tree"]:
+                    if "content" in entry:
+                        blob = repo.put_blob(entry["content"].encode())
+                    else:
+                        blob = entry["sha"]
+                    tree = repo.write_path(tree, entry["path"].split("/"), blob)
+                return self.send(201, {"sha": tree, "tree": []})
+
+            if method == "POST" and path == "/git/commits":
+                body = self.body()
+                return self.send(201, {"sha": repo.put_commit(body["tree"], body["parents"], body["message"])})
+
+            if method == "POST" and path == "/git/refs":
+                body = self.body()
+                branch = body["ref"][len("refs/heads/"):]
+                if branch in repo.refs:
+                    return self.send(422, {"message": "Reference already exists"})
+                repo.refs[branch] = body["sha"]
+                return self.send(201, {"ref": body["ref"], "object": {"sha": body["sha"]}})
+
+            match = re.fullmatch(r"/git/refs/heads/(.+)", path)
+            if method == "PATCH" and match:
+                body = self.body()
+                current = repo.refs[match.group(1)]
+                if not body.get("force") and current not in repo.objects[body["sha"]][1]["parents"]:
+                    return self.send(422, {"message": "Update is not a fast forward"})
+                repo.refs[match.group(1)] = body["sha"]
+                return self.send(200, {"object": {"sha": body["sha"]}})
+
+            return self.send(404, {"message": f"No fake for {method} {path}"})
+
+        def do_GET(self):
+            self.route("GET")
+
+        def do_POST(self):
+            self.route("POST")
+
+        def do_PATCH(self):
+            self.route("PATCH")
+
+        def do_PUT(self):
+            self.route("PUT")
+
+    return Handler
+
+
+def start(repo=None, latency=0.0):
+    # Serve `repo` (or a new empty one) on a free port; returns (repo, base URL)
+    repo = repo or FakeRepo(latency=latency)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(repo))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return repo, f"http://127.0.0.1:{server.server_port}"
@@ -0,0 +1,41 @@
+"""Bounded LRU cache of rendered HTML, one fragment per task.
+
+Tasks are immutable and an edit gives the task a new title or description,
+so (id, title, description) identifies what a fragment shows and cached
+fragments never go stale. A list card re-renders by looking up each visible
+task and building tag trees only for the ones it hasn't seen. The cache is
+shared by every session in the process; TODO_FRAGMENT_CACHE sets its size.
+"""
+import os
+from collections import OrderedDict
+
+MAX_ENTRIES = int(os.environ.get("TODO_FRAGMENT_CACHE", "5000"))
+
+
+class FragmentCache:
+    def __init__(self, render, max_entries=MAX_ENTRIES):
+        # render(task) -> HTML string
+        self.render = render
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, task):
+        key = (task.id, task.title, task.description)
+        html = self.entries.get(key)
+        if html is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return html
+        self.misses += 1
+        html = self.entries[key] = self.render(task)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return html
+
+    def join(self, tasks):
+        # The fragments for `tasks` as one string, plus (hits, misses) for this call
+        hits, misses = self.hits, self.misses
+        html = "".join(self.get(task) for task in tasks)
+        return html, self.hits - hits, self.misses - misses
@@ -0,0 +1,171 @@
+"""Process-wide scheduler for GitHub API requests.
+
+Every call github_sync makes goes through RequestScheduler.request(). Per
+token, requests are sent one at a time, paced from the X-RateLimit-* headers
+so the remaining quota lasts until the reset, and held back after a
+Retry-After or an exhausted limit. Rate-limited requests are retried for any
+method, since GitHub didn't act on them; server errors and dropped
+connections are retried only for idempotent methods, with jittered
+exponential backoff.
+
+Requests block the calling thread while they wait, so like the rest of
+github_sync they belong in a worker thread.
+"""
+import random
+import threading
+import time
+
+import requests
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUSES = {500, 502, 503, 504}
+MAX_ATTEMPTS = 5
+BASE_DELAY = 1.0
+# Longest we'll hold a request back; beyond this it fails instead
+MAX_DELAY = 60.0
+SECONDARY_LIMIT_WAIT = 60.0
+# Below this many remaining calls, spread the rest evenly until the reset,
+# but never more than PACE_LIMIT seconds apart
+LOW_REMAINING = 100
+PACE_LIMIT = 10.0
+
+
+class RateLimitWait(Exception):
+    def __init__(self, seconds):
+        super().__init__(f"GitHub rate limit reached, try again in {seconds:.0f}s")
+        self.seconds = seconds
+
+
+class _TokenState:
+    def __init__(self):
+        # Held while a request for this token is on the wire
+        self.turn = threading.Lock()
+        self.pending = 0
+        self.not_before = 0.0
+        self.min_interval = 0.0
+        self.last_sent = 0.0
+        self.retry_at = None
+
+
+class RequestScheduler:
+    def __init__(self, clock=time.monotonic, wall_clock=time.time, sleep=time.sleep):
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.tokens = {}
+
+    def _state(self, token):
+        with self.lock:
+            if token not in self.tokens:
+                self.tokens[token] = _TokenState()
+            return self.tokens[token]
+
+    def status(self, token):
+        # (requests pending for `token`, seconds until the next retry or None)
+        with self.lock:
+            state = self.tokens.get(token)
+            if state is None:
+                return 0, None
+            retry_in = None
+            if state.retry_at is not None:
+                retry_in = max(0.0, state.retry_at - self.clock())
+            return state.pending, retry_in
+
+    def request(self, token, method, send):
+        # `send()` performs the HTTP request once and returns the response
+        state = self._state(token)
+        with self.lock:
+            state.pending += 1
+        try:
+            attempt = 1
+            while True:
+                with state.turn:
+                    self._wait_turn(state)
+                    try:
+                        response, error = send(), None
+                    except (requests.ConnectionError, requests.Timeout) as exc:
+                        response, error = None, exc
+                    state.last_sent = self.clock()
+                    if response is not None:
+                        self._read_limits(state, response)
+
+                delay = self._retry_delay(method, response, error, attempt)
+                if delay is None:
+                    if error is not None:
+                        raise error
+                    return response
+                attempt += 1
+                state.retry_at = self.clock() + delay
+                self.sleep(delay)
+                state.retry_at = None
+        finally:
+            with self.lock:
+                state.pending -= 1
+
+    def _wait_turn(self, state):
+        while True:
+            ready_at = max(state.not_before, state.last_sent + state.min_interval)
+            wait = ready_at - self.clock()
+            if wait <= 0:
+                return
+            if wait > MAX_DELAY:
+                raise RateLimitWait(wait)
+            state.retry_at = ready_at
+            self.sleep(wait)
+            state.retry_at = None
+
+    def _read_limits(self, state, response):
+        now = self.clock()
+        headers = response.headers
+        remaining = _int_header(headers, "X-RateLimit-Remaining")
+        reset = _int_header(headers, "X-RateLimit-Reset")
+        until_reset = max(0.0, reset - self.wall_clock()) if reset is not None else None
+
+        retry_after = _int_header(headers, "Retry-After")
+        if _rate_limited(response) and retry_after is not None:
+            state.not_before = max(state.not_before, now + retry_after)
+        elif remaining == 0 and until_reset is not None:
+            state.not_before = max(state.not_before, now + until_reset)
+        elif _rate_limited(response):
+            # Secondary limit without a hint: GitHub asks for at least a minute
+            state.not_before = max(state.not_before, now + SECONDARY_LIMIT_WAIT)
+
+        if remaining is not None and until_reset is not None and remaining < LOW_REMAINING:
+            state.min_interval = min(PACE_LIMIT, until_reset / max(remaining, 1))
+        else:
+            state.min_interval = 0.0
+
+    def _retry_delay(self, method, response, error, attempt):
+        if attempt >= MAX_ATTEMPTS:
+            return None
+        if response is not None and _rate_limited(response):
+            # The wait itself happens in _wait_turn, for every request on the token
+            return 0.0
+        if method not in IDEMPOTENT_METHODS:
+            return None
+        if error is not None or response.status_code in RETRY_STATUSES:
+            return random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** (attempt - 1)))
+        return None
+
+
+def _int_header(headers, name):
+    try:
+        return int(headers[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def _rate_limited(response):
+    if response.status_code == 429:
+        return True
+    return response.status_code == 403 and (
+        "Retry-After" in response.headers
+        or response.headers.get("X-RateLimit-Remaining") == "0"
+        # A secondary limit can come with neither header; only the message says so
+        or "secondary rate limit" in response.text.lower()
+    )
+
+
+# Shared by every session and client in the process
+scheduler = RequestScheduler()
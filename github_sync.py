@@ -0,0 +1,468 @@
+"""Blocking GitHub client for the task lists.
+
+Each list is stored as its own file under DATA_DIR, in the ToDoList.txt
+format, next to a gzipped snapshot of the same list (todo_codec) that keeps
+task ids and decodes in one step. A snapshot records the SHA of the text it
+was written with; loads use it only while the text is unchanged, so a hand
+edit of the text file on GitHub still wins. A save uploads only the lists
+that changed since the last sync and commits them in one tree/commit/ref
+update through the Git Data API. The ref update is not forced, so it fails
+if another writer got there first; the save then merges their edits into
+ours task by task (task_merge) and commits again on top of theirs. A repo
+that still has the old single ToDoList.txt is read once and migrated on the
+next save. Completed tasks go to the append-only archive under
+ARCHIVE_DIR (see task_archive), written in the same commit as the lists and
+read only on demand. A branch that doesn't exist yet is created by the
+first save, with a root commit; a repository with no commits at all first
+gets one through the contents API, since the Git Data API refuses to write
+to it.
+
+Every request goes through github_scheduler, which paces and retries them.
+These calls are meant to run in a worker thread (see the extended tasks in
+app.py), never directly inside a reactive effect.
+"""
+import base64
+import hashlib
+import re
+import threading
+import time
+from collections import defaultdict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from github_scheduler import scheduler
+from task_archive import decode_records, encode_records, partition_of
+from task_merge import merge_lists
+from task_store import TaskList
+from todo_codec import encode_list, pack_snapshot, parse_bytes, unpack_snapshot
+
+API_URL = "https://api.github.com"
+LEGACY_PATH = "ToDoList.txt"
+DATA_DIR = "ToDoList"
+# Committed through the contents API to give an empty repository its first commit
+README_PATH = f"{DATA_DIR}/README.md"
+README = b"Task lists saved by the To-Do app.\n"
+SNAPSHOT_SUFFIX = ".json.gz"
+ARCHIVE_DIR = f"{DATA_DIR}/archive"
+ARCHIVE_SUFFIX = ".jsonl.gz"
+TIMEOUT = 30
+# How long a successful check_access() is trusted before it's asked again
+ACCESS_TTL = 10 * 60
+# A save that keeps losing the race for the branch gives up after this many commits
+SAVE_ATTEMPTS = 3
+
+# One pooled session for the whole process, so calls reuse keep-alive TLS
+# connections to api.github.com instead of opening a new one per request
+http = requests.Session()
+http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+# One load or save per repo at a time across all sessions in this process:
+# clients are shared, and both read and move a client's sync state
+_repo_locks = defaultdict(threading.Lock)
+
+
+class GitHubError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"GitHub returned {status_code}")
+        self.status_code = status_code
+
+
+def blob_sha(content):
+    # The SHA git itself assigns to a blob, so we never need to ask for it
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def list_path(list_id):
+    return f"{DATA_DIR}/{list_id}.txt"
+
+
+def snapshot_path(list_id):
+    return f"{DATA_DIR}/{list_id}{SNAPSHOT_SUFFIX}"
+
+
+def archive_path(partition):
+    return f"{ARCHIVE_DIR}/{partition}{ARCHIVE_SUFFIX}"
+
+
+def endpoint_label(path):
+    # Metrics label without SHAs or branch names, e.g. "/git/blobs/:sha"
+    path = re.sub(r"/[0-9a-f]{40}$", "/:sha", path)
+    return re.sub(r"^(/git/refs?/heads)/.+$", r"\1/:branch", path) or "/"
+
+
+class GitHubClient:
+    def __init__(self, repo, token):
+        self.repo = repo
+        self.token = token
+        self.branch = None
+        # Branch tip we last read or wrote, its root tree, and the blob SHA of
+        # every list file in it
+        self.head = None
+        self.tree = None
+        self.ref_etag = None
+        # True when the last ref read found a repository without any commits
+        self.empty = False
+        self.blob_shas = {}
+        self.snapshot_shas = {}
+        # Per list: the TaskList we last loaded or saved and the blob SHA it was
+        # stored as. A list is locally edited iff it's no longer that object.
+        self.base = {}
+        # True while `head` still has the old single file
+        self.legacy = False
+        # (root tree, {partition: blob SHA}) for the archive as last seen, and
+        # the partitions we've downloaded or written, by blob SHA. A partition
+        # only grows into a new blob, so a SHA's content never goes stale.
+        self.archive_index = (None, {})
+        self.archive_blobs = {}
+        # When check_access() last succeeded
+        self.verified_at = None
+
+    @property
+    def headers(self):
+        return {
+            "Authorization": f"token {self.token}",
+            "Accept": "application/vnd.github.v3+json"
+        }
+
+    def _request(self, method, path, ok=(200,), headers=None, **kwargs):
+        def send():
+            started = time.perf_counter()
+            try:
+                response = http.request(
+                    method,
+                    f"{API_URL}/repos/{self.repo}{path}",
+                    headers={**self.headers, **(headers or {})},
+                    timeout=TIMEOUT,
+                    **kwargs
+                )
+            except requests.RequestException:
+                metrics.record_github(method, endpoint_label(path), "network_error", time.perf_counter() - started)
+                raise
+            metrics.record_github(method, endpoint_label(path), response.status_code, time.perf_counter() - started)
+            return response
+
+        # Paced, and retried when that's safe, by the shared scheduler
+        response = scheduler.request(self.token, method, send)
+        if response.status_code not in ok:
+            raise GitHubError(response.status_code)
+        return response
+
+    def _get_json(self, path):
+        return self._request("GET", path).json()
+
+    def check_access(self):
+        # Raises GitHubError unless the token can push to the repo: 404 (or
+        # 401) when it can't see it at all, 403 when it can only read
+        info = self._get_json("")
+        if not info.get("permissions", {}).get("push"):
+            raise GitHubError(403)
+        self.branch = self.branch or info["default_branch"]
+        self.verified_at = time.monotonic()
+
+    @property
+    def verified(self):
+        return self.verified_at is not None and time.monotonic() - self.verified_at < ACCESS_TTL
+
+    def _branch(self):
+        if self.branch is None:
+            self.branch = self._get_json("")["default_branch"]
+        return self.branch
+
+    def _read_head(self):
+        # Branch tip SHA, or None if there's no branch yet; a 304 on the
+        # ref's ETag means it hasn't moved
+        headers = {}
+        if self.head and self.ref_etag:
+            headers["If-None-Match"] = self.ref_etag
+        response = self._request(
+            "GET", f"/git/ref/heads/{self._branch()}", ok=(200, 304, 404, 409), headers=headers
+        )
+        if response.status_code == 304:
+            return self.head
+        # 409: the repository is empty
+        self.empty = response.status_code == 409
+        if response.status_code != 200:
+            self.ref_etag = None
+            return None
+        self.ref_etag = response.headers.get("ETag")
+        return response.json()["object"]["sha"]
+
+    def _read_tree(self, commit_sha):
+        # Point head/tree/blob_shas at `commit_sha` (None: no branch yet);
+        # returns the legacy file's SHA
+        tree_sha = None
+        entries = {}
+        if commit_sha is not None:
+            tree_sha = self._get_json(f"/git/commits/{commit_sha}")["tree"]["sha"]
+            entries = {entry["path"]: entry for entry in self._get_json(f"/git/trees/{tree_sha}")["tree"]}
+
+        blobs = {}
+        snapshots = {}
+        if DATA_DIR in entries and entries[DATA_DIR]["type"] == "tree":
+            for entry in self._get_json(f"/git/trees/{entries[DATA_DIR]['sha']}")["tree"]:
+                if entry["type"] != "blob":
+                    continue
+                if entry["path"].endswith(".txt"):
+                    blobs[entry["path"][:-len(".txt")]] = entry["sha"]
+                elif entry["path"].endswith(SNAPSHOT_SUFFIX):
+                    snapshots[entry["path"][:-len(SNAPSHOT_SUFFIX)]] = entry["sha"]
+        legacy = entries.get(LEGACY_PATH, {}).get("sha")
+
+        self.head = commit_sha
+        self.tree = tree_sha
+        self.blob_shas = blobs
+        self.snapshot_shas = snapshots
+        self.legacy = legacy is not None
+        return legacy
+
+    def _read_blob(self, sha):
+        return base64.b64decode(self._get_json(f"/git/blobs/{sha}")["content"])
+
+    def _upload_blob(self, content):
+        # Binary content can't go inline in a tree, so it's uploaded first
+        self._request(
+            "POST", "/git/blobs", ok=(201,),
+            json={"content": base64.b64encode(content).decode(), "encoding": "base64"}
+        )
+
+    def _read_list(self, list_id, sha, list_names):
+        snapshot = self.snapshot_shas.get(list_id)
+        if snapshot:
+            try:
+                lists, meta = unpack_snapshot(self._read_blob(snapshot), {list_id: list_names[list_id]})
+            except (ValueError, KeyError, TypeError):
+                pass
+            else:
+                if meta.get("text_sha") == sha:
+                    return lists[list_id]
+        # No snapshot, or the text was edited since it was written
+        return parse_bytes(self._read_blob(sha), list_names)[list_id]
+
+    def _archive_shas(self, root):
+        # {partition: blob SHA} of the archive in root tree `root`
+        if root is None:
+            return {}
+        if self.archive_index[0] == root:
+            return self.archive_index[1]
+        shas = {}
+        tree = root
+        for name in ARCHIVE_DIR.split("/"):
+            entries = self._get_json(f"/git/trees/{tree}")["tree"]
+            tree = next(
+                (entry["sha"] for entry in entries if entry["path"] == name and entry["type"] == "tree"),
+                None
+            )
+            if tree is None:
+                break
+        else:
+            for entry in self._get_json(f"/git/trees/{tree}")["tree"]:
+                if entry["type"] == "blob" and entry["path"].endswith(ARCHIVE_SUFFIX):
+                    shas[entry["path"][:-len(ARCHIVE_SUFFIX)]] = entry["sha"]
+        self.archive_index = (root, shas)
+        return shas
+
+    def _archive_blob(self, sha):
+        if sha not in self.archive_blobs:
+            self.archive_blobs[sha] = self._read_blob(sha)
+        return self.archive_blobs[sha]
+
+    def load_archive(self):
+        # Every archive record, oldest partition first. Only partitions that
+        # changed since we last read them are downloaded. The tip is only read
+        # here, not synced to: moving `head` would let the next save skip
+        # merging the lists someone else changed meanwhile.
+        with _repo_locks[self.repo]:
+            response = self._request("GET", f"/git/ref/heads/{self._branch()}", ok=(200, 404, 409))
+            if response.status_code != 200:
+                return []
+            head = response.json()["object"]["sha"]
+            tree = self.tree if head == self.head else self._get_json(f"/git/commits/{head}")["tree"]["sha"]
+            records = []
+            for partition, sha in sorted(self._archive_shas(tree).items()):
+                records.extend(decode_records(self._archive_blob(sha)))
+            return records
+
+    def load(self, list_names):
+        # Returns (lists, modified). A list whose blob matches what we last
+        # synced comes back as the same TaskList object.
+        with _repo_locks[self.repo]:
+            head = self._read_head()
+            up_to_date = head == self.head and all(
+                list_id in self.base and self.base[list_id][1] == self.blob_shas.get(list_id)
+                for list_id in list_names
+            )
+            if up_to_date:
+                return {list_id: self.base[list_id][0] for list_id in list_names}, False
+
+            legacy = self._read_tree(head)
+            if not self.blob_shas and legacy:
+                # Old layout: read the single file once; the next save migrates it
+                lists = parse_bytes(self._read_blob(legacy), list_names)
+                self.base = {list_id: (tasks, None) for list_id, tasks in lists.items()}
+                return lists, True
+
+            lists = {}
+            for list_id in list_names:
+                sha = self.blob_shas.get(list_id)
+                if list_id in self.base and self.base[list_id][1] == sha:
+                    lists[list_id] = self.base[list_id][0]
+                elif sha is None:
+                    lists[list_id] = TaskList()
+                else:
+                    lists[list_id] = self._read_list(list_id, sha, list_names)
+                self.base[list_id] = (lists[list_id], sha)
+            return lists, True
+
+    def _commit(self, entries, message):
+        tree = self._request(
+            "POST", "/git/trees", ok=(201,),
+            json={"base_tree": self.tree, "tree": entries} if self.tree else {"tree": entries}
+        ).json()
+        commit = self._request(
+            "POST", "/git/commits", ok=(201,),
+            json={"message": message, "tree": tree["sha"], "parents": [self.head] if self.head else []}
+        ).json()
+        if self.head is None:
+            # No branch yet: a root commit and a new ref, which fails with
+            # 422 if someone else created the branch meanwhile
+            self._request(
+                "POST", "/git/refs", ok=(201,),
+                json={"ref": f"refs/heads/{self._branch()}", "sha": commit["sha"]}
+            )
+        else:
+            # Not forced: fails with 422 if someone else moved the branch meanwhile
+            self._request(
+                "PATCH", f"/git/refs/heads/{self._branch()}", ok=(200,),
+                json={"sha": commit["sha"], "force": False}
+            )
+        self.head = commit["sha"]
+        self.tree = tree["sha"]
+        self.ref_etag = None
+
+    def save(self, lists, list_names, message="Update task lists", archive=()):
+        # Returns the lists as saved: `lists` itself, unless another writer
+        # moved the branch meanwhile and their edits were merged in.
+        # `archive`: task_archive records to append in the same commit
+        with _repo_locks[self.repo]:
+            if self.head is None or any(list_id not in self.base for list_id in list_names):
+                # Never loaded through this client (new token, restart, lists
+                # restored from the browser), or loaded before the branch
+                # existed: we can't tell our edits from what's there now, so
+                # merge with it, against an empty base where there's none
+                head = self._read_head()
+                if head is None and self.empty:
+                    self._create_first_commit()
+                    head = self._read_head()
+                self._read_tree(head)
+                if not (self.legacy and not self.blob_shas):
+                    lists = self._merge_remote(lists, list_names)
+
+            for attempt in range(1, SAVE_ATTEMPTS + 1):
+                changed = self._encode_changed(lists, list_names)
+                if not changed and not archive:
+                    return lists
+                try:
+                    self._commit_lists(changed, archive, message)
+                    break
+                except GitHubError as error:
+                    if error.status_code != 422 or attempt == SAVE_ATTEMPTS:
+                        raise
+                # The branch moved: merge the other writer's edits into ours and
+                # try again on top of the new tip. The archive is appended to
+                # again, onto the new tip's partitions.
+                self._read_tree(self._read_head())
+                lists = self._merge_remote(lists, list_names)
+
+            for list_id, (_, sha, snapshot_sha) in changed.items():
+                self.base[list_id] = (lists[list_id], sha)
+                self.blob_shas[list_id] = sha
+                self.snapshot_shas[list_id] = snapshot_sha
+            return lists
+
+    def _create_first_commit(self):
+        # 422: someone else's first commit got there before ours
+        self._request(
+            "PUT", f"/contents/{README_PATH}", ok=(201, 422),
+            json={"message": "Create task list folder", "content": base64.b64encode(README).decode()}
+        )
+
+    def _encode_changed(self, lists, list_names):
+        # {list_id: (text, text SHA, snapshot SHA)} for the lists to write.
+        # Identity check: an unedited list is still the object we last synced.
+        migrating = self.legacy and not self.blob_shas
+        changed = {}
+        for list_id in list_names:
+            if not migrating and lists[list_id] is self.base.get(list_id, (None,))[0]:
+                continue
+            content = encode_list(list_names[list_id], lists[list_id])
+            sha = blob_sha(content)
+            snapshot = pack_snapshot({list_id: lists[list_id]}, text_sha=sha)
+            changed[list_id] = (content, sha, blob_sha(snapshot))
+            if changed[list_id][2] != self.snapshot_shas.get(list_id):
+                self._upload_blob(snapshot)
+        return changed
+
+    def _merge_remote(self, lists, list_names):
+        # Three-way merge of `lists` with the branch as just read, against
+        # what we last synced. Lists the other writer changed are downloaded
+        # and become our new sync base.
+        empty = TaskList()
+        base = {}
+        remote = {}
+        for list_id in list_names:
+            synced, synced_sha = self.base.get(list_id, (empty, None))
+            sha = self.blob_shas.get(list_id)
+            base[list_id] = synced
+            if sha == synced_sha:
+                remote[list_id] = synced
+            else:
+                remote[list_id] = self._read_list(list_id, sha, list_names) if sha else TaskList()
+            self.base[list_id] = (remote[list_id], sha)
+        merged = merge_lists(base, lists, remote)
+        # Nothing of theirs to take: still the caller's lists
+        if all(merged[list_id] is lists[list_id] for list_id in list_names):
+            return lists
+        return merged
+
+    def _commit_lists(self, changed, archive, message):
+        entries = []
+        for list_id, (content, sha, snapshot_sha) in changed.items():
+            if sha != self.blob_shas.get(list_id):
+                entries.append({
+                    "path": list_path(list_id), "mode": "100644", "type": "blob",
+                    "content": content.decode()
+                })
+            if snapshot_sha != self.snapshot_shas.get(list_id):
+                entries.append({
+                    "path": snapshot_path(list_id), "mode": "100644", "type": "blob",
+                    "sha": snapshot_sha
+                })
+        archive_shas = self._append_archive(archive, entries) if archive else None
+        if self.legacy:
+            entries.append({"path": LEGACY_PATH, "mode": "100644", "type": "blob", "sha": None})
+        if entries:
+            self._commit(entries, message)
+        if archive_shas is not None:
+            self.archive_index = (self.tree, archive_shas)
+        self.legacy = False
+
+    def _append_archive(self, records, entries):
+        # Upload each touched partition with the records appended as a new gzip
+        # member; adds the tree entries and returns the partitions' new SHAs
+        shas = dict(self._archive_shas(self.tree))
+        by_partition = {}
+        for record in records:
+            by_partition.setdefault(partition_of(record), []).append(record)
+        for partition, appended in sorted(by_partition.items()):
+            existing = self._archive_blob(shas[partition]) if partition in shas else b""
+            content = existing + encode_records(appended)
+            sha = blob_sha(content)
+            self._upload_blob(content)
+            # Keep only the newest version of a partition around
+            self.archive_blobs.pop(shas.get(partition), None)
+            self.archive_blobs[sha] = content
+            shas[partition] = sha
+            entries.append({"path": archive_path(partition), "mode": "100644", "type": "blob", "sha": sha})
+        return shas
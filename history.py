@@ -0,0 +1,72 @@
+"""Undo/redo over a board's lists, in bounded memory.
+
+A step keeps the TaskList objects of the lists it changed, from before and
+after the change. TaskLists share every node a change didn't touch, so a
+step only costs the nodes and tasks its own versions hold: a few hundred
+bytes for an edit, the old contents for a load that replaced a list. Once
+the steps add up to more than `max_bytes`, the oldest are dropped. The
+latest step is always kept, so even a large load can be undone.
+
+A step only applies while the lists it covers are still the versions it
+left behind; if something else changed them since, undo() and redo()
+return None.
+"""
+import os
+from collections import deque
+
+MAX_BYTES = int(float(os.environ.get("TODO_UNDO_MB", "8")) * 2**20)
+
+
+class _Step:
+    __slots__ = ("before", "after", "cost")
+
+    def __init__(self, before, after):
+        self.before = before
+        self.after = after
+        self.cost = 0
+
+
+class History:
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.undo_steps = deque()
+        self.redo_steps = []
+        self.size = 0
+
+    def can_undo(self):
+        return bool(self.undo_steps)
+
+    def can_redo(self):
+        return bool(self.redo_steps)
+
+    def record(self, before, after):
+        # `before`/`after`: {list_id: TaskList} for the lists a change touched
+        self.size -= sum(step.cost for step in self.redo_steps)
+        self.redo_steps.clear()
+        self._push(self.undo_steps, _Step(before, after), before, after)
+        while self.size > self.max_bytes and len(self.undo_steps) > 1:
+            self.size -= self.undo_steps.popleft().cost
+
+    def undo(self, current):
+        # The lists to set to undo the latest step, or None
+        return self._move(self.undo_steps, self.redo_steps, current, "after", "before")
+
+    def redo(self, current):
+        return self._move(self.redo_steps, self.undo_steps, current, "before", "after")
+
+    def _move(self, source, target, current, expect, restore):
+        if not source:
+            return None
+        step = source[-1]
+        if any(current[list_id] is not tasks for list_id, tasks in getattr(step, expect).items()):
+            return None
+        source.pop()
+        self.size -= step.cost
+        # What the step keeps alive now is the versions we're leaving
+        self._push(target, step, getattr(step, expect), getattr(step, restore))
+        return getattr(step, restore)
+
+    def _push(self, stack, step, kept, live):
+        step.cost = sum(kept[list_id].unshared_bytes(live[list_id]) for list_id in kept)
+        self.size += step.cost
+        stack.append(step)
@@ -0,0 +1,56 @@
+"""Optional server-side SQLite cache of the last synced lists, keyed by repo
+and a hash of the GitHub token that synced them.
+
+Enabled by pointing TODO_CACHE_DB at a database file. Values are snapshots
+from todo_codec.dump_snapshot. A snapshot is only handed back for the token
+it was written with, so knowing a repo's name isn't enough to read it; the
+token itself is never stored.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+class LocalCache:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        # Snapshots keyed by repo alone, from before tokens were part of the
+        # key; nothing says who may read them, so they go
+        self.db.execute("DROP TABLE IF EXISTS snapshots")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS token_snapshots ("
+            "repo TEXT NOT NULL, token_hash TEXT NOT NULL, payload TEXT NOT NULL, "
+            "updated_at REAL NOT NULL, PRIMARY KEY (repo, token_hash))"
+        )
+        self.db.commit()
+
+    def get(self, repo, token):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT payload FROM token_snapshots WHERE repo = ? AND token_hash = ?",
+                (repo, token_hash(token))
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, repo, token, payload):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO token_snapshots (repo, token_hash, payload, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (repo, token_hash(token), payload, time.time())
+            )
+            self.db.commit()
+
+
+def token_hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def open_cache():
+    path = os.environ.get("TODO_CACHE_DB")
+    return LocalCache(path) if path else None
@@ -0,0 +1,221 @@
+"""Opt-in instrumentation: handler timings, render sizes and GitHub calls.
+
+Enabled by setting TODO_METRICS=1. app.py then serves the numbers in the
+Prometheus text format at /metrics next to the Shiny app. Setting
+TODO_METRICS_LOG=1 as well logs every observation as one JSON object per
+line on the "todo.metrics" logger.
+
+With metrics off the decorators return the function unchanged and record()
+returns at once, so there is nothing to pay. With them on, a rendered output
+is serialized once more to measure it.
+"""
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+
+from shiny.types import SilentException
+
+ENABLED = os.environ.get("TODO_METRICS", "") not in ("", "0")
+LOG = ENABLED and os.environ.get("TODO_METRICS_LOG", "") not in ("", "0")
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HELP = {
+    "todo_handler_seconds": ("histogram", "Wall time of reactive effects and output renders"),
+    "todo_render_bytes": ("histogram", "Size of each rendered output"),
+    "todo_handler_errors_total": ("counter", "Effects and renders that raised"),
+    "todo_github_requests_total": ("counter", "GitHub API requests by status code"),
+    "todo_github_request_seconds": ("histogram", "GitHub API request latency"),
+    "todo_fragment_cache_total": ("counter", "Task HTML fragment cache lookups by result"),
+}
+
+logger = logging.getLogger("todo.metrics")
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+_lock = threading.Lock()
+# name -> {labels (sorted tuple of pairs): Histogram or count}
+_series = {name: {} for name in HELP}
+
+
+def observe(metric, value, buckets, **labels):
+    key = tuple(sorted(labels.items()))
+    with _lock:
+        series = _series[metric]
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram(buckets)
+        histogram.observe(value)
+
+
+def increment(metric, amount=1, **labels):
+    key = tuple(sorted(labels.items()))
+    with _lock:
+        series = _series[metric]
+        series[key] = series.get(key, 0) + amount
+
+
+def record(event, **fields):
+    # Log one structured line; callers update the series themselves
+    if LOG:
+        logger.info(json.dumps({"event": event, **fields}, separators=(",", ":")))
+
+
+def record_github(method, endpoint, status, seconds):
+    if not ENABLED:
+        return
+    increment("todo_github_requests_total", method=method, endpoint=endpoint, status=str(status))
+    observe("todo_github_request_seconds", seconds, SECONDS_BUCKETS, method=method, endpoint=endpoint)
+    record("github", method=method, endpoint=endpoint, status=status, ms=round(seconds * 1000, 2))
+
+
+def record_fragments(hits, misses):
+    if not ENABLED:
+        return
+    if hits:
+        increment("todo_fragment_cache_total", hits, result="hit")
+    if misses:
+        increment("todo_fragment_cache_total", misses, result="miss")
+
+
+def _payload_size(value):
+    if value is None:
+        return 0
+    return len(str(value).encode())
+
+
+def _instrument(fn, kind, name, measure):
+    name = name or fn.__name__
+
+    def finish(started, result, failed):
+        seconds = time.perf_counter() - started
+        observe("todo_handler_seconds", seconds, SECONDS_BUCKETS, kind=kind, name=name)
+        fields = {"kind": kind, "name": name, "ms": round(seconds * 1000, 2)}
+        if failed:
+            increment("todo_handler_errors_total", kind=kind, name=name)
+            fields["error"] = True
+        elif measure:
+            size = _payload_size(result)
+            observe("todo_render_bytes", size, BYTES_BUCKETS, name=name)
+            fields["bytes"] = size
+        record("handler", **fields)
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper():
+            started = time.perf_counter()
+            try:
+                result = await fn()
+            except SilentException:
+                # req() and friends: not an error, just no output
+                finish(started, None, False)
+                raise
+            except BaseException:
+                finish(started, None, True)
+                raise
+            finish(started, result, False)
+            return result
+    else:
+        @functools.wraps(fn)
+        def wrapper():
+            started = time.perf_counter()
+            try:
+                result = fn()
+            except SilentException:
+                # req() and friends: not an error, just no output
+                finish(started, None, False)
+                raise
+            except BaseException:
+                finish(started, None, True)
+                raise
+            finish(started, result, False)
+            return result
+    return wrapper
+
+
+def timed(fn=None, *, name=None):
+    """Time a reactive effect. Goes directly above the def."""
+    if fn is None:
+        return functools.partial(timed, name=name)
+    return _instrument(fn, "effect", name, False) if ENABLED else fn
+
+
+def rendered(fn=None, *, name=None):
+    """Time an output's render function and measure what it returns."""
+    if fn is None:
+        return functools.partial(rendered, name=name)
+    return _instrument(fn, "output", name, True) if ENABLED else fn
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in pairs
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def render_prometheus():
+    lines = []
+    with _lock:
+        for name, (kind, help_text) in HELP.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in sorted(_series[name].items()):
+                if kind == "counter":
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(value.buckets, value.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {value.count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {value.sum}")
+                lines.append(f"{name}_count{_format_labels(key)} {value.count}")
+    return "\n".join(lines) + "\n"
+
+
+async def endpoint(request):
+    # Starlette route handler for /metrics
+    from starlette.responses import PlainTextResponse
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+def mount(shiny_app):
+    # The ASGI app to serve: Shiny alone, or Shiny with /metrics beside it
+    if not ENABLED:
+        return shiny_app
+    from starlette.applications import Starlette
+    from starlette.routing import Mount, Route
+
+    if LOG and not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return Starlette(routes=[Route("/metrics", endpoint), Mount("/", app=shiny_app)])
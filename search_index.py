@@ -0,0 +1,135 @@
+"""In-memory full-text index over the tasks in every list.
+
+The index remembers which TaskList it last indexed for each list and, on
+sync(), only applies the tasks that TaskList.diff() reports as removed or
+added, so an edit costs about as much as the edit itself instead of a
+rebuild. Terms match words by prefix; title words count double.
+"""
+import bisect
+import heapq
+import re
+
+
+
+TITLE_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+# A whole-word match ranks above a match on just the start of a word
+EXACT_BONUS = 2
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return _WORD.findall(text.lower())
+
+
+class SearchIndex:
+    def __init__(self):
+        # Per list: the TaskList the index currently reflects
+        self.indexed = {}
+        # task id -> (list_id, Task)
+        self.tasks = {}
+        # word -> {task id: weight}
+        self.postings = {}
+        # Every word in `postings`, sorted, for prefix lookups
+        self.words = []
+
+    def sync(self, lists):
+        changes = []
+        for list_id, tasks in lists.items():
+            previous = self.indexed.get(list_id)
+            if tasks is previous:
+                continue
+            if previous is None:
+                changes.append((list_id, ((), tasks)))
+            else:
+                changes.append((list_id, tasks.diff(previous)))
+            self.indexed[list_id] = tasks
+        # All removals first: a task moved between lists is removed from one
+        # and added to the other in the same sync
+        for list_id, (removed, _) in changes:
+            for task in removed:
+                self._remove(list_id, task)
+        new_words = []
+        for list_id, (_, added) in changes:
+            for task in added:
+                self._add(list_id, task, new_words)
+        if len(new_words) > 100:
+            # A bulk load: one sort beats many insertions
+            self.words = sorted(self.postings)
+        else:
+            for word in new_words:
+                bisect.insort(self.words, word)
+
+    def _weights(self, task):
+        weights = {}
+        for word in tokenize(task.title):
+            weights[word] = weights.get(word, 0) + TITLE_WEIGHT
+        for word in tokenize(task.description):
+            weights[word] = weights.get(word, 0) + DESCRIPTION_WEIGHT
+        return weights
+
+    def _add(self, list_id, task, new_words):
+        self.tasks[task.id] = (list_id, task)
+        for word, weight in self._weights(task).items():
+            postings = self.postings.get(word)
+            if postings is None:
+                postings = self.postings[word] = {}
+                new_words.append(word)
+            postings[task.id] = weight
+
+    def _remove(self, list_id, task):
+        # Only if the index still holds this exact version of the task
+        if self.tasks.get(task.id) != (list_id, task):
+            return
+        del self.tasks[task.id]
+        for word in self._weights(task):
+            postings = self.postings[word]
+            del postings[task.id]
+            if not postings:
+                del self.postings[word]
+                del self.words[bisect.bisect_left(self.words, word)]
+
+    def _matches(self, term):
+        # Best score per task for one query term, over every word it prefixes
+        scores = {}
+        start = bisect.bisect_left(self.words, term)
+        for word in self.words[start:]:
+            if not word.startswith(term):
+                break
+            bonus = EXACT_BONUS if word == term else 1
+            for task_id, weight in self.postings[word].items():
+                score = weight * bonus
+                if score > scores.get(task_id, 0):
+                    scores[task_id] = score
+        return scores
+
+    def search(self, query, limit=20):
+        # Returns (total matches, [(list_id, Task), ...] best first). Every
+        # term has to match.
+        terms = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not terms:
+            return 0, []
+        scores = None
+        for term in terms:
+            matches = self._matches(term)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {
+                    task_id: score + matches[task_id]
+                    for task_id, score in scores.items()
+                    if task_id in matches
+                }
+            if not scores:
+                return 0, []
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return len(scores), [self.tasks[task_id] for task_id, _ in best]
+
+    def locate(self, task_ids):
+        # task id -> list id, for ids that are still indexed
+        return {
+            task_id: self.tasks[task_id][0]
+            for task_id in task_ids
+            if task_id in self.tasks
+        }
@@ -0,0 +1,304 @@
+"""Task boards shared by every session in this process that works on the same repo.
+
+A board holds one reactive value per list plus the sync state for its repo.
+Because the reactive values live at module level, an edit in one session
+invalidates the outputs of every other session attached to the same board,
+and a single GitHub load serves all of them.
+
+Boards on a repo are also written through to the state backend
+(state_backend), which with TODO_STATE_DB set is shared by every worker
+process: sessions poll it through refresh() and pick up other workers' edits
+the same way they pick up edits from this process. Edits are written there
+by the same poll, at most once per POLL_INTERVAL/2 per board, rather than on
+every keystroke.
+
+Being on a repo's board means seeing and editing its unsaved tasks, so a
+session only gets one with a GitHub client whose token has passed
+check_access() for that repo: acquire() and find_loaded() refuse anything
+else. Clients are verified per process, so with a shared backend every
+worker checks the token itself before a session there can join.
+"""
+import threading
+import time
+
+from shiny import reactive
+
+from autosave import AutoSaveScheduler
+from github_sync import GitHubClient
+from history import History
+from search_index import SearchIndex
+from state_backend import POLL_INTERVAL, open_backend
+from task_archive import record_key
+from task_store import TaskList
+
+# How long a board nobody is attached to stays in memory
+IDLE_TTL = 15 * 60
+
+
+class Board:
+    def __init__(self, list_names, repo=None):
+        self.repo = repo
+        self.list_names = list_names
+        # One reactive value per list, so an edit only invalidates the outputs
+        # that read the list it touched
+        self.lists = {list_id: reactive.value(TaskList()) for list_id in list_names}
+        self.unsaved = reactive.value(False)
+        # Every edit goes through mark_changed() so auto-save sees the whole burst
+        self.auto_saver = AutoSaveScheduler()
+        self.edit_count = reactive.value(0)
+        # Undo/redo steps, and the lists as of the last recorded step
+        self.history = History()
+        with reactive.isolate():
+            self.recorded = self.get_all()
+        self.history_version = reactive.value(0)
+        # Brought up to date from the lists on each search, not on each edit
+        self.search_index = SearchIndex()
+        # task_archive records (completions and restores) for the next save,
+        # and the ones as last written to or read from the backend
+        self.archive_pending = []
+        self.archive_published = []
+        # Set once the board holds data read from GitHub or a cache
+        self.loaded = False
+        # The lists as last loaded from or saved to GitHub, which unsaved
+        # edits are merged against when a load comes in
+        with reactive.isolate():
+            self.synced = self.get_all()
+        self.refs = 0
+        self.idle_since = time.monotonic()
+        # Backend version this board is up to date with, the lists as last
+        # written there or read back, when we last asked for newer ones, and
+        # whether there are edits still to write
+        self.version = 0
+        with reactive.isolate():
+            self.published = self.get_all()
+        self.checked_at = 0.0
+        self.publish_due = False
+
+    def get_all(self):
+        return {list_id: value.get() for list_id, value in self.lists.items()}
+
+    def set_all(self, lists):
+        for list_id, tasks in lists.items():
+            self.lists[list_id].set(tasks)
+
+    def is_empty(self):
+        return not any(value.get() for value in self.lists.values())
+
+    def mark_changed(self):
+        self.record()
+        self.unsaved.set(True)
+        self.auto_saver.touch()
+        with reactive.isolate():
+            self.edit_count.set(self.edit_count.get() + 1)
+        if backend.shared:
+            # Written by the next refresh(), with whatever follows this edit
+            self.publish_due = True
+        else:
+            self.publish()
+
+    def record(self):
+        # Make the lists changed since the last step an undo step
+        with reactive.isolate():
+            current = self.get_all()
+        changed = [list_id for list_id, tasks in current.items() if tasks is not self.recorded[list_id]]
+        if not changed:
+            return
+        self.history.record(
+            {list_id: self.recorded[list_id] for list_id in changed},
+            {list_id: current[list_id] for list_id in changed}
+        )
+        self.recorded = current
+        self._history_changed()
+
+    def undo(self):
+        return self._step(self.history.undo)
+
+    def redo(self):
+        return self._step(self.history.redo)
+
+    def _step(self, move):
+        with reactive.isolate():
+            lists = move(self.get_all())
+        if lists is None:
+            return False
+        self.set_all(lists)
+        # Not a step of its own
+        self.recorded = {**self.recorded, **lists}
+        self.mark_changed()
+        self._history_changed()
+        return True
+
+    def _history_changed(self):
+        with reactive.isolate():
+            self.history_version.set(self.history_version.get() + 1)
+
+    def publish(self):
+        # Write the lists changed since the last publish, and the flags, to
+        # the backend; picks up anything other workers wrote in the meantime
+        if self.repo is None:
+            return
+        with reactive.isolate():
+            current = self.get_all()
+            unsaved = self.unsaved.get()
+        changed = {
+            list_id: tasks for list_id, tasks in current.items()
+            if tasks is not self.published.get(list_id)
+        }
+        pending = {record_key(record) for record in self.archive_pending}
+        published = {record_key(record) for record in self.archive_published}
+        self.publish_due = False
+        self.version, newer, unsaved, archive = backend.commit(
+            self.repo, self.version, changed, self.published, unsaved, self.loaded,
+            [record for record in self.archive_pending if record_key(record) not in published],
+            [record for record in self.archive_published if record_key(record) not in pending]
+        )
+        self.published.update(changed)
+        self._apply_remote(newer, unsaved, archive)
+
+    def refresh(self):
+        # Pull other workers' edits; cheap when there are none
+        now = time.monotonic()
+        if self.repo is None or not backend.shared or now - self.checked_at < POLL_INTERVAL / 2:
+            return
+        self.checked_at = now
+        if self.publish_due:
+            # Also picks up anything newer
+            self.publish()
+            return
+        state = backend.changes(self.repo, self.version, self.list_names)
+        if state is None:
+            return
+        self.version, lists, unsaved, loaded, archive = state
+        self.loaded = self.loaded or loaded
+        self._apply_remote(lists, unsaved, archive)
+
+    def _apply_remote(self, lists, unsaved, archive=None):
+        # Other workers' edits aren't steps in this process's history
+        self.published.update(lists)
+        self.recorded = {**self.recorded, **lists}
+        self.set_all(lists)
+        self.unsaved.set(unsaved)
+        if archive is not None:
+            self.archive_pending = archive
+            self.archive_published = list(archive)
+
+    def apply(self, batch):
+        # Run a task_batch.Batch and set each list it touched once
+        with reactive.isolate():
+            current = self.get_all()
+        updated = batch.apply(current)
+        changed = {
+            list_id: tasks for list_id, tasks in updated.items()
+            if tasks is not current[list_id]
+        }
+        if changed:
+            self.set_all(changed)
+            self.mark_changed()
+        return changed
+
+    def archive_to_save(self, lists):
+        # The latest pending record per task, where it still agrees with
+        # `lists`: a completion that was undone isn't archived, and a restore
+        # that was undone isn't recorded
+        latest = {record["id"]: record for record in self.archive_pending}
+        live = set()
+        for tasks in lists.values():
+            live.update(tasks.positions_of(latest))
+        return [
+            record for record in latest.values()
+            if (record["op"] == "restore") == (record["id"] in live)
+        ]
+
+    def archive_saved(self, records):
+        saved = {record["id"] for record in records}
+        self.archive_pending = [record for record in self.archive_pending if record["id"] not in saved]
+
+    def search(self, query, limit=20):
+        self.search_index.sync(self.get_all())
+        return self.search_index.search(query, limit)
+
+
+
+_boards = {}
+# GitHub clients by (repo, token); they hold the per-list sync base
+_clients = {}
+_lock = threading.Lock()
+backend = open_backend()
+
+
+def client(repo, token):
+    with _lock:
+        if (repo, token) not in _clients:
+            _clients[repo, token] = GitHubClient(repo, token)
+        return _clients[repo, token]
+
+
+def forget(client):
+    # Drop a client whose token turned out not to have access
+    with _lock:
+        if _clients.get((client.repo, client.token)) is client:
+            del _clients[client.repo, client.token]
+
+
+def private_board(list_names):
+    # A session's own board until it starts working on a repo
+    return Board(list_names)
+
+
+def acquire(client, list_names):
+    # The board for `client`'s repo; only for a client that passed check_access()
+    if not client.verified:
+        raise PermissionError(f"no verified access to {client.repo}")
+    repo = client.repo
+    now = time.monotonic()
+    with _lock:
+        _evict_idle(now)
+        board = _boards.get(repo)
+        created = board is None
+        if created:
+            board = _boards[repo] = Board(list_names, repo)
+        board.refs += 1
+        board.idle_since = None
+    if created:
+        # Start from what other workers (or this one, before a restart) left
+        board.refresh()
+    return board
+
+
+def find_loaded(client):
+    # Is there a board on `client`'s repo to join, in this process or (with a
+    # shared backend) in another one? Checked in each worker against its own
+    # verified client, so the backend never tells an unverified token more
+    # than acquire() would
+    if not client.verified:
+        raise PermissionError(f"no verified access to {client.repo}")
+    board = _boards.get(client.repo)
+    if board is not None:
+        return board.loaded
+    return backend.shared and backend.has_board(client.repo)
+
+
+def release(board):
+    if board.repo is None:
+        return
+    if board.publish_due:
+        board.publish()
+    with _lock:
+        board.refs -= 1
+        if board.refs <= 0:
+            board.refs = 0
+            board.idle_since = time.monotonic()
+
+
+def _evict_idle(now):
+    for repo, board in list(_boards.items()):
+        if board.refs or now - board.idle_since < IDLE_TTL:
+            continue
+        # Unsaved edits stay until someone comes back to save them, unless
+        # the shared backend is holding them
+        with reactive.isolate():
+            if board.unsaved.get() and not backend.shared:
+                continue
+        del _boards[repo]
+        for key in [key for key in _clients if key[0] == repo]:
+            del _clients[key]
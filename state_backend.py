@@ -0,0 +1,181 @@
+"""Where shared boards keep their lists, so several worker processes can serve one repo.
+
+The default MemoryBackend keeps nothing outside the process: each worker
+has its own boards, as before. Pointing TODO_STATE_DB at a SQLite file
+shares them instead. A board's edits are written there, at most about once
+per POLL_INTERVAL, as a new per-repo version holding the lists they touched,
+the board's unsaved and loaded flags and its pending archive records.
+Workers poll that version and read back only the lists that changed since
+the version they hold. If another worker wrote one of the same lists in the
+meantime, the two are merged task by task (task_merge) instead of the later
+write replacing the earlier one. Unsaved edits survive a worker restart, because
+a new board starts from what the database holds.
+
+Lists are stored as todo_codec snapshots, so task ids survive the trip.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from task_archive import record_key
+from task_merge import merge_lists
+from todo_codec import dump_snapshot, load_snapshot
+
+# How often sessions check a shared backend for other workers' edits
+POLL_INTERVAL = 1.0
+
+
+class MemoryBackend:
+    # Nothing to share: every call is a no-op
+    shared = False
+
+    def commit(self, repo, since, lists, base, unsaved, loaded, pending_added=(), pending_removed=()):
+        return since + 1, {}, unsaved, None
+
+    def changes(self, repo, since, list_names):
+        return None
+
+    def has_board(self, repo):
+        return False
+
+
+class SQLiteBackend:
+    shared = True
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        # Transactions are managed by hand so a commit can take the write lock up front
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS boards ("
+            "repo TEXT PRIMARY KEY, version INTEGER NOT NULL, "
+            "unsaved INTEGER NOT NULL, loaded INTEGER NOT NULL, updated_at REAL NOT NULL, "
+            "archive TEXT NOT NULL DEFAULT '[]')"
+        )
+        if "archive" not in {row[1] for row in self.db.execute("PRAGMA table_info(boards)")}:
+            try:
+                self.db.execute("ALTER TABLE boards ADD COLUMN archive TEXT NOT NULL DEFAULT '[]'")
+            except sqlite3.OperationalError:
+                # Another worker added it first
+                pass
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS lists ("
+            "repo TEXT NOT NULL, list_id TEXT NOT NULL, version INTEGER NOT NULL, "
+            "payload TEXT NOT NULL, PRIMARY KEY (repo, list_id))"
+        )
+
+    def commit(self, repo, since, lists, base, unsaved, loaded, pending_added=(), pending_removed=()):
+        # Write `lists` ({list_id: TaskList}, edited from `base`, every list
+        # as of `since`) as the next version, and add and remove pending
+        # archive records. Returns (version, lists that now differ from
+        # `lists` and `base`: other workers' edits, merged with ours where we
+        # both changed a list; unsaved flag, all pending archive records).
+        payloads = {list_id: dump_snapshot({list_id: tasks}) for list_id, tasks in lists.items()}
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.db.execute(
+                    "SELECT version, unsaved, loaded, archive FROM boards WHERE repo = ?", (repo,)
+                ).fetchone()
+                current, stored_unsaved, stored_loaded, stored_archive = row or (0, False, False, "[]")
+                newer = dict(self.db.execute(
+                    "SELECT list_id, payload FROM lists WHERE repo = ? AND version > ?",
+                    (repo, since)
+                ))
+                if newer.keys() & payloads.keys():
+                    newer, merged = self._merge(newer, lists, base)
+                    payloads = {
+                        list_id: payloads[list_id] if tasks is lists.get(list_id)
+                        else dump_snapshot({list_id: tasks})
+                        for list_id, tasks in merged.items()
+                    }
+                else:
+                    newer = self._decode(newer)
+                # Other workers' edits we haven't seen are still unsaved
+                unsaved = bool(unsaved or (newer and stored_unsaved))
+                # Applied as changes, so records other workers queued meanwhile stay
+                removed = {record_key(record) for record in pending_removed}
+                pending = [record for record in json.loads(stored_archive) if record_key(record) not in removed]
+                queued = {record_key(record) for record in pending}
+                pending.extend(record for record in pending_added if record_key(record) not in queued)
+                version = current + 1
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO lists (repo, list_id, version, payload) VALUES (?, ?, ?, ?)",
+                    [(repo, list_id, version, payload) for list_id, payload in payloads.items()]
+                )
+                self.db.execute(
+                    "INSERT OR REPLACE INTO boards (repo, version, unsaved, loaded, updated_at, archive) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (repo, version, unsaved, bool(loaded or stored_loaded), time.time(), json.dumps(pending))
+                )
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        return version, newer, unsaved, pending
+
+    def changes(self, repo, since, list_names):
+        # None if nothing was written after `since`, else (version,
+        # {list_id: TaskList} changed since then, unsaved, loaded, pending
+        # archive records)
+        with self.lock:
+            self.db.execute("BEGIN")
+            try:
+                row = self.db.execute(
+                    "SELECT version, unsaved, loaded, archive FROM boards WHERE repo = ?", (repo,)
+                ).fetchone()
+                if row is None or row[0] <= since:
+                    return None
+                payloads = dict(self.db.execute(
+                    "SELECT list_id, payload FROM lists WHERE repo = ? AND version > ?",
+                    (repo, since)
+                ))
+            finally:
+                self.db.execute("COMMIT")
+        lists = self._decode({
+            list_id: payload for list_id, payload in payloads.items() if list_id in list_names
+        })
+        return row[0], lists, bool(row[1]), bool(row[2]), json.loads(row[3])
+
+    def has_board(self, repo):
+        # Has any worker loaded, saved or edited `repo`?
+        with self.lock:
+            row = self.db.execute("SELECT 1 FROM boards WHERE repo = ?", (repo,)).fetchone()
+        return row is not None
+
+    def _merge(self, payloads, lists, base):
+        # Another worker wrote some of `lists` after we last synced: merge
+        # theirs into ours. Returns (lists that differ from ours now, lists
+        # that differ from what's stored: the ones to write).
+        theirs = self._decode(payloads)
+        list_ids = lists.keys() | theirs.keys()
+        merged = merge_lists(
+            {list_id: base[list_id] for list_id in list_ids},
+            {list_id: lists.get(list_id, base[list_id]) for list_id in list_ids},
+            {list_id: theirs.get(list_id, base[list_id]) for list_id in list_ids}
+        )
+        differ = {
+            list_id: merged[list_id] for list_id in list_ids
+            if merged[list_id] is not lists.get(list_id, base[list_id])
+        }
+        changed = {
+            list_id: merged[list_id] for list_id in list_ids
+            if merged[list_id] is not theirs.get(list_id, base[list_id])
+        }
+        return differ, changed
+
+    def _decode(self, payloads):
+        lists = {}
+        for list_id, payload in payloads.items():
+            decoded, _ = load_snapshot(payload, [list_id])
+            lists[list_id] = decoded[list_id]
+        return lists
+
+
+def open_backend():
+    path = os.environ.get("TODO_STATE_DB")
+    return SQLiteBackend(path) if path else MemoryBackend()
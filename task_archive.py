@@ -0,0 +1,103 @@
+"""Cold storage for completed tasks.
+
+Completing a task takes it out of its list and queues an "archive" record;
+restoring it queues a "restore" record. The next save appends the queued
+records to ToDoList/archive/<YYYY-MM>.jsonl.gz, one partition per month (UTC)
+in which the records were made. Records are never rewritten: an append adds
+one more gzip member to the partition, so only the current month's file ever
+changes, and gzip reads the members back as one stream.
+
+Archived tasks are not part of a normal load. They are read when someone
+searches the archive, and Archive replays the records into the set of tasks
+that are archived now, indexed for search like the live lists.
+"""
+import gzip
+import json
+import time
+
+from search_index import SearchIndex
+from task_store import Task, TaskList
+
+
+def now():
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def partition_of(record):
+    # "YYYY-MM" from the record's timestamp
+    return record["at"][:7]
+
+
+def archive_record(list_id, task, at=None):
+    return {
+        "op": "archive", "id": task.id, "list": list_id,
+        "title": task.title, "description": task.description, "at": at or now()
+    }
+
+
+def restore_record(task_id, at=None):
+    return {"op": "restore", "id": task_id, "at": at or now()}
+
+
+def record_key(record):
+    # Identifies a record across copies of it, e.g. after a JSON round trip
+    return json.dumps(record, sort_keys=True)
+
+
+def encode_records(records):
+    # One gzip member, to append to a partition; mtime=0 keeps it deterministic
+    lines = "".join(
+        json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n" for record in records
+    )
+    return gzip.compress(lines.encode(), mtime=0)
+
+
+def decode_records(data):
+    try:
+        text = gzip.decompress(data).decode()
+    except (OSError, EOFError, UnicodeDecodeError) as error:
+        raise ValueError(f"unreadable archive: {error}") from None
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+class Archive:
+    """The tasks archived after replaying some records, oldest first."""
+
+    def __init__(self, list_names, records=()):
+        self.list_names = list_names
+        # id -> (list_id, Task, archived at), in the order they were archived
+        self.tasks = {}
+        self.index = SearchIndex()
+        self.indexed = None
+        self.apply(records)
+
+    def apply(self, records):
+        for record in records:
+            if record.get("op") == "archive":
+                # A list that no longer exists restores into the first one
+                list_id = record.get("list")
+                if list_id not in self.list_names:
+                    list_id = next(iter(self.list_names))
+                task = Task(record.get("title", ""), record.get("description", ""), record["id"])
+                self.tasks.pop(task.id, None)
+                self.tasks[task.id] = (list_id, task, record.get("at", ""))
+            elif record.get("op") == "restore":
+                self.tasks.pop(record["id"], None)
+        self.indexed = None
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def search(self, query, limit=20):
+        # (total, [(list_id, Task, archived at)]); the latest ones for an empty query
+        if not query.strip():
+            latest = list(self.tasks.values())[::-1]
+            return len(latest), latest[:limit]
+        if self.indexed is None:
+            lists = {list_id: [] for list_id in self.list_names}
+            for list_id, task, _ in self.tasks.values():
+                lists[list_id].append(task)
+            self.indexed = {list_id: TaskList(tasks) for list_id, tasks in lists.items()}
+            self.index.sync(self.indexed)
+        total, results = self.index.search(query, limit)
+        return total, [self.tasks[task.id] for _, task in results]
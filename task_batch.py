@@ -0,0 +1,83 @@
+"""Several list edits applied as one update.
+
+Build a Batch, then hand it to Board.apply(): the edits run against plain
+TaskLists and only the final version of each list is set, so a batch costs
+one reactive invalidation per touched list however many tasks it holds.
+"""
+
+
+class Batch:
+    def __init__(self):
+        self.operations = []
+
+    def __len__(self):
+        return len(self.operations)
+
+    def add(self, list_id, tasks, position=None):
+        # Insert at `position`, or append when it's None
+        self.operations.append(("add", list_id, list(tasks), position))
+
+    # `near` on delete and move: (list_id, start, stop) where the tasks
+    # probably are, e.g. the page they were selected on. It's searched first,
+    # so finding them there doesn't walk every list.
+
+    def delete(self, task_ids, near=None):
+        self.operations.append(("delete", tuple(task_ids), near))
+
+    def move(self, task_ids, list_id, position=None, near=None):
+        # Take the tasks out of whatever lists hold them, keeping their order,
+        # and insert them into `list_id` at `position` (counted after they are
+        # taken out), or at the end
+        self.operations.append(("move", tuple(task_ids), list_id, position, near))
+
+    def retarget(self, task_ids, list_id, near=None):
+        # Send tasks to the end of another list
+        self.move(task_ids, list_id, near=near)
+
+    def apply(self, lists):
+        # Returns a new {list_id: TaskList}; lists no edit touched are the
+        # same objects as before
+        lists = dict(lists)
+        for operation, *args in self.operations:
+            if operation == "add":
+                _insert(lists, *args)
+            elif operation == "delete":
+                _cut(lists, *args)
+            elif operation == "move":
+                task_ids, list_id, position, near = args
+                _insert(lists, list_id, _cut(lists, task_ids, near), position)
+        return lists
+
+
+def _insert(lists, list_id, tasks, position):
+    if not tasks:
+        return
+    current = lists[list_id]
+    if position is None:
+        lists[list_id] = current.extend(tasks)
+    else:
+        lists[list_id] = current.insert_many(max(0, min(position, len(current))), tasks)
+
+
+def _cut(lists, task_ids, near=None):
+    # Remove the tasks from every list that has them; returns them in list order
+    wanted = set(task_ids)
+    taken = []
+    order = list(lists)
+    windows = {}
+    if near is not None and near[0] in lists:
+        # Where they probably are first
+        order.sort(key=lambda list_id: list_id != near[0])
+        windows[near[0]] = near[1:]
+    for list_id in order:
+        if not wanted:
+            break
+        tasks = lists[list_id]
+        positions = tasks.positions_of(wanted, *windows.get(list_id, ()))
+        if not positions:
+            continue
+        indices = sorted(positions.values())
+        taken.extend(tasks.take(indices))
+        lists[list_id] = tasks.delete_many(indices)
+        wanted.difference_update(positions)
+    return taken
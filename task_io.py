@@ -0,0 +1,169 @@
+"""Bulk import and export of tasks as CSV, JSON Lines or ToDoList.txt text.
+
+Readers take a text stream and yield (list_id, Task) one row at a time;
+writers yield the document in chunks. Neither holds a whole file as a
+single string, so large files are streamed through in bounded memory.
+
+CSV has the columns title, description and list; JSON Lines has one
+{"title", "description", "list"} object per line. `list` may be a list id
+or its display name and defaults to the list being imported into. Text
+accepts the ToDoList.txt layout, or just one task title per line.
+"""
+import csv
+import io
+import json
+
+from task_store import Task
+from todo_codec import DESCRIPTION_PREFIX, iter_chunks
+
+FORMATS = {
+    "csv": "CSV",
+    "jsonl": "JSON Lines",
+    "txt": "Text (ToDoList.txt)"
+}
+
+# Writers hand out chunks of about this many characters
+CHUNK_SIZE = 64 * 1024
+
+
+def detect_format(filename):
+    extension = filename.rsplit(".", 1)[-1].lower()
+    if extension == "ndjson":
+        return "jsonl"
+    return extension if extension in FORMATS else "txt"
+
+
+def _list_resolver(list_names, default_list):
+    lookup = {name.casefold(): list_id for list_id, name in list_names.items()}
+    lookup.update({list_id.casefold(): list_id for list_id in list_names})
+
+    def resolve(value, line_number):
+        # JSON Lines can hold anything here, not just the strings CSV and text give
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"line {line_number}: list must be a string")
+        if not value:
+            return default_list
+        list_id = lookup.get(value.strip().casefold())
+        if list_id is None:
+            raise ValueError(f"line {line_number}: unknown list {value!r}")
+        return list_id
+
+    return resolve
+
+
+def iter_csv(stream, list_names, default_list):
+    resolve = _list_resolver(list_names, default_list)
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames or "title" not in reader.fieldnames:
+        raise ValueError("CSV needs a 'title' column")
+    for row in reader:
+        title = (row.get("title") or "").strip()
+        if title:
+            list_id = resolve(row.get("list"), reader.line_num)
+            yield list_id, Task(title, (row.get("description") or "").strip())
+
+
+def iter_jsonl(stream, list_names, default_list):
+    resolve = _list_resolver(list_names, default_list)
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            raise ValueError(f"line {line_number}: not valid JSON") from None
+        if not isinstance(row, dict):
+            raise ValueError(f"line {line_number}: expected an object")
+        title = str(row.get("title") or "").strip()
+        if title:
+            list_id = resolve(row.get("list"), line_number)
+            yield list_id, Task(title, str(row.get("description") or "").strip())
+
+
+def iter_text(stream, list_names, default_list):
+    # Like ToDoParser, but lines before any header (or without the "- "
+    # marker) are tasks too, and unknown headers are errors
+    resolve = _list_resolver(list_names, default_list)
+    list_id = default_list
+    pending = None
+    for line_number, line in enumerate(stream, 1):
+        line = line.rstrip()
+        if pending is not None and line.startswith(DESCRIPTION_PREFIX):
+            yield list_id, Task(pending, line[len(DESCRIPTION_PREFIX):].strip())
+            pending = None
+            continue
+        if pending is not None:
+            yield list_id, Task(pending)
+            pending = None
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if stripped.startswith("===") and stripped.endswith("==="):
+            list_id = resolve(stripped.strip("= "), line_number)
+        else:
+            pending = stripped[2:].strip() if stripped.startswith("- ") else stripped
+    if pending is not None:
+        yield list_id, Task(pending)
+
+
+READERS = {"csv": iter_csv, "jsonl": iter_jsonl, "txt": iter_text}
+
+
+def read_tasks(stream, fmt, list_names, default_list):
+    # Returns {list_id: [Task, ...]} for the lists that got any tasks
+    tasks = {}
+    try:
+        for list_id, task in READERS[fmt](stream, list_names, default_list):
+            tasks.setdefault(list_id, []).append(task)
+    except csv.Error as error:
+        raise ValueError(str(error)) from None
+    return tasks
+
+
+def read_file(path, fmt, list_names, default_list):
+    # newline="" lets the csv module handle line endings inside quoted fields
+    with open(path, encoding="utf-8-sig", newline="") as stream:
+        return read_tasks(stream, fmt, list_names, default_list)
+
+
+def read_text(text, fmt, list_names, default_list):
+    return read_tasks(io.StringIO(text, newline=""), fmt, list_names, default_list)
+
+
+def _iter_csv_rows(lists, list_names):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["list", "title", "description"])
+    for list_id, list_name in list_names.items():
+        for task in lists[list_id]:
+            writer.writerow([list_name, task.title, task.description])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _iter_jsonl_rows(lists, list_names):
+    for list_id, list_name in list_names.items():
+        for task in lists[list_id]:
+            yield json.dumps(
+                {"list": list_name, "title": task.title, "description": task.description},
+                ensure_ascii=False
+            ) + "\n"
+
+
+WRITERS = {"csv": _iter_csv_rows, "jsonl": _iter_jsonl_rows, "txt": iter_chunks}
+
+
+def iter_export(lists, list_names, fmt):
+    buffer = []
+    size = 0
+    for piece in WRITERS[fmt](lists, list_names):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer)
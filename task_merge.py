@@ -0,0 +1,179 @@
+"""Three-way merge of task lists, by task id.
+
+merge_lists() takes the lists as last synced (base), as edited here (ours)
+and as they are on GitHub now (theirs), all {list_id: TaskList}, and
+combines the two sets of edits:
+
+- A task added on either side is kept.
+- A task deleted on one side is dropped, unless the other side edited it;
+  an edit is never lost to a delete.
+- Title and description merge separately; when both sides changed the
+  same field, ours wins.
+- A task moved to another list on one side ends up there; if both sides
+  moved it, ours wins.
+- Order within a list starts from theirs. The tasks we added, moved in
+  or reordered are then placed after the task that precedes them in ours.
+
+Lists that neither side changed are passed through untouched, so a
+conflict costs about as much as the lists it involves.
+"""
+import bisect
+
+from task_store import TaskList
+
+
+def merge_lists(base, ours, theirs):
+    touched = [
+        list_id for list_id in ours
+        if ours[list_id] is not base[list_id] or theirs[list_id] is not base[list_id]
+    ]
+    merged = dict(ours)
+    for list_id in touched:
+        # Either side unchanged: nothing to merge
+        if ours[list_id] is base[list_id]:
+            merged[list_id] = theirs[list_id]
+        elif theirs[list_id] is base[list_id]:
+            merged[list_id] = ours[list_id]
+    conflicted = [
+        list_id for list_id in touched
+        if ours[list_id] is not base[list_id] and theirs[list_id] is not base[list_id]
+    ]
+    if not conflicted:
+        return merged
+
+    # Tasks can move between lists, so ids are resolved across every list
+    # either side touched, not one list at a time
+    sides = [_locate(lists, touched) for lists in (base, ours, theirs)]
+    placement = {}
+    for task_id in sides[0].keys() | sides[1].keys() | sides[2].keys():
+        resolved = _resolve(*(side.get(task_id) for side in sides))
+        if resolved is not None:
+            placement[task_id] = resolved
+
+    for list_id in touched:
+        target = {
+            task_id for task_id, (resolved_list, _) in placement.items()
+            if resolved_list == list_id
+        }
+        order = _order(
+            [task.id for task in base[list_id]],
+            [task.id for task in ours[list_id]],
+            [task.id for task in theirs[list_id]],
+            target
+        )
+        tasks = [placement[task_id][1] for task_id in order]
+        if _same(tasks, theirs[list_id]):
+            merged[list_id] = theirs[list_id]
+        elif _same(tasks, ours[list_id]):
+            merged[list_id] = ours[list_id]
+        else:
+            merged[list_id] = TaskList(tasks)
+    return merged
+
+
+def _locate(lists, list_ids):
+    # task id -> (list_id, Task)
+    found = {}
+    for list_id in list_ids:
+        for task in lists[list_id]:
+            found[task.id] = (list_id, task)
+    return found
+
+
+def _edited(original, task):
+    return task.title != original.title or task.description != original.description
+
+
+def _resolve(base, ours, theirs):
+    # (list_id, Task) the task ends up as, or None if it's deleted
+    if base is None:
+        # Added on one side (ids are unique, so both sides means the same task)
+        return ours or theirs
+    original = base[1]
+    if ours is None and theirs is None:
+        return None
+    if ours is None:
+        return theirs if _edited(original, theirs[1]) else None
+    if theirs is None:
+        return ours if _edited(original, ours[1]) else None
+
+    list_id = theirs[0] if ours[0] == base[0] else ours[0]
+    mine, other = ours[1], theirs[1]
+    if not _edited(original, mine):
+        task = other
+    elif not _edited(original, other):
+        task = mine
+    else:
+        task = mine.replace(
+            title=other.title if mine.title == original.title else mine.title,
+            description=other.description if mine.description == original.description else mine.description
+        )
+    return list_id, task
+
+
+def _stable(base_order, order):
+    # Ids of `order` that kept their relative base order: the longest run of
+    # base positions that only increases. Everything else was moved.
+    position = {task_id: i for i, task_id in enumerate(base_order)}
+    kept = [task_id for task_id in order if task_id in position]
+    tails = []
+    tail_index = []
+    previous = [None] * len(kept)
+    for i, task_id in enumerate(kept):
+        at = bisect.bisect_left(tails, position[task_id])
+        if at == len(tails):
+            tails.append(position[task_id])
+            tail_index.append(i)
+        else:
+            tails[at] = position[task_id]
+            tail_index[at] = i
+        previous[i] = tail_index[at - 1] if at else None
+    stable = set()
+    i = tail_index[-1] if tail_index else None
+    while i is not None:
+        stable.add(kept[i])
+        i = previous[i]
+    return stable
+
+
+def _order(base_order, our_order, their_order, target):
+    our_stable = _stable(base_order, our_order)
+    their_ids = set(their_order)
+    # Ours to place: added or moved in by us, reordered by us, or kept by us
+    # when they deleted it
+    placed = {
+        task_id for task_id in our_order
+        if task_id in target and (task_id not in our_stable or task_id not in their_ids)
+    }
+    kept = [task_id for task_id in their_order if task_id in target and task_id not in placed]
+
+    # Hang each placed task after its nearest predecessor in ours that
+    # will be in the result
+    present = set(kept)
+    follows = {}
+    anchor = None
+    for task_id in our_order:
+        if task_id in placed:
+            follows.setdefault(anchor, []).append(task_id)
+            anchor = task_id
+        elif task_id in present:
+            anchor = task_id
+
+    order = []
+
+    def emit_followers(task_id):
+        stack = list(reversed(follows.get(task_id, ())))
+        while stack:
+            follower = stack.pop()
+            order.append(follower)
+            stack.extend(reversed(follows.get(follower, ())))
+
+    emit_followers(None)
+    for task_id in kept:
+        order.append(task_id)
+        emit_followers(task_id)
+    return order
+
+
+def _same(tasks, task_list):
+    return len(tasks) == len(task_list) and all(a is b for a, b in zip(tasks, task_list))
@@ -0,0 +1,303 @@
+"""Immutable task records and a persistent ordered task list.
+
+Every update returns a new TaskList that shares all untouched nodes with the
+previous version, so old snapshots stay valid and changes can be detected
+with a plain identity check.
+"""
+import collections
+import heapq
+import itertools
+import os
+import random
+import sys
+
+# Random per-process prefix plus a counter: unique across processes, and far
+# cheaper than a uuid4 per task when parsing large files
+_ID_PREFIX = os.urandom(6).hex()
+_id_counter = itertools.count(1)
+
+
+def new_task_id():
+    return f"{_ID_PREFIX}{next(_id_counter):x}"
+
+
+class Task:
+    __slots__ = ("id", "title", "description")
+
+    def __init__(self, title, description="", id=None):
+        self.id = id or new_task_id()
+        self.title = title
+        self.description = description
+
+    def replace(self, title=None, description=None):
+        # Same id, new content
+        return Task(
+            self.title if title is None else title,
+            self.description if description is None else description,
+            self.id
+        )
+
+    def __repr__(self):
+        return f"Task({self.title!r}, {self.description!r}, id={self.id!r})"
+
+
+class _Node:
+    # Implicit treap node: ordered by position, heap-ordered by priority
+    __slots__ = ("task", "priority", "size", "left", "right")
+
+    def __init__(self, task, priority, left=None, right=None):
+        self.task = task
+        self.priority = priority
+        self.left = left
+        self.right = right
+        self.size = 1 + _size(left) + _size(right)
+
+
+def _size(node):
+    return node.size if node is not None else 0
+
+
+_NODE_BYTES = sys.getsizeof(_Node(None, 0.0))
+
+
+def _task_bytes(task):
+    return (
+        sys.getsizeof(task) + sys.getsizeof(task.id)
+        + sys.getsizeof(task.title) + sys.getsizeof(task.description)
+    )
+
+
+def _with_children(node, left, right):
+    # Path copying: never modify a node that another version may share
+    return _Node(node.task, node.priority, left, right)
+
+
+def _merge(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        return _with_children(left, left.left, _merge(left.right, right))
+    return _with_children(right, _merge(left, right.left), right.right)
+
+
+def _split(node, count):
+    # Returns (first `count` items, the rest)
+    if node is None:
+        return None, None
+    left_size = _size(node.left)
+    if count <= left_size:
+        first, rest = _split(node.left, count)
+        return first, _with_children(node, rest, node.right)
+    first, rest = _split(node.right, count - left_size - 1)
+    return _with_children(node, node.left, first), rest
+
+
+def _build(tasks):
+    # Balanced tree built breadth-first, giving out a sorted run of random
+    # priorities in that order so every parent outranks its children. Sizes
+    # are known from the ranges, so nothing needs a second pass.
+    tasks = tasks if isinstance(tasks, list) else list(tasks)
+    if not tasks:
+        return None
+    priorities = sorted([random.random() for _ in tasks], reverse=True)
+    root = None
+    pending = collections.deque([(0, len(tasks), None, False)])
+    for priority in priorities:
+        start, stop, parent, is_left = pending.popleft()
+        middle = (start + stop) // 2
+        node = _Node.__new__(_Node)
+        node.task = tasks[middle]
+        node.priority = priority
+        node.size = stop - start
+        node.left = node.right = None
+        if parent is None:
+            root = node
+        elif is_left:
+            parent.left = node
+        else:
+            parent.right = node
+        if start < middle:
+            pending.append((start, middle, node, True))
+        if middle + 1 < stop:
+            pending.append((middle + 1, stop, node, False))
+    return root
+
+
+def _iter_nodes(node, start=0):
+    # In-order walk beginning at position `start`: O(log n) to get there
+    stack = []
+    while node is not None:
+        left_size = _size(node.left)
+        if start < left_size:
+            stack.append(node)
+            node = node.left
+        elif start == left_size:
+            stack.append(node)
+            break
+        else:
+            start -= left_size + 1
+            node = node.right
+    while stack:
+        node = stack.pop()
+        yield node.task
+        node = node.right
+        while node is not None:
+            stack.append(node)
+            node = node.left
+
+
+def _diff_nodes(old, new):
+    # Nodes only in `old` and nodes only in `new`. Both trees are expanded
+    # together in priority order; a shared node keeps its priority, so both
+    # of its parents are expanded before it and it is seen on both sides
+    # before either copy is. Only the copied paths and their children are
+    # visited, not the shared subtrees.
+    private = ([], [])
+    reached = (set(), set())
+    heap = []
+    counter = itertools.count()
+    for side, root in enumerate((old, new)):
+        if root is not None:
+            reached[side].add(id(root))
+            heapq.heappush(heap, (-root.priority, next(counter), side, root))
+    while heap:
+        _, _, side, node = heapq.heappop(heap)
+        if id(node) in reached[1 - side]:
+            continue
+        private[side].append(node)
+        for child in (node.left, node.right):
+            if child is not None:
+                reached[side].add(id(child))
+                heapq.heappush(heap, (-child.priority, next(counter), side, child))
+    return private
+
+
+class TaskList:
+    """Persistent sequence of Task records with O(log n) positional updates."""
+
+    __slots__ = ("_root",)
+
+    def __init__(self, tasks=()):
+        self._root = _build(tasks)
+
+    @classmethod
+    def _from_root(cls, root):
+        new = cls.__new__(cls)
+        new._root = root
+        return new
+
+    def __len__(self):
+        return _size(self._root)
+
+    def __bool__(self):
+        return self._root is not None
+
+    def __iter__(self):
+        return _iter_nodes(self._root)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("task index out of range")
+        node = self._root
+        while True:
+            left_size = _size(node.left)
+            if index < left_size:
+                node = node.left
+            elif index == left_size:
+                return node.task
+            else:
+                index -= left_size + 1
+                node = node.right
+
+    def __repr__(self):
+        return f"TaskList({list(self)!r})"
+
+    def insert(self, index, task):
+        first, rest = _split(self._root, index)
+        return TaskList._from_root(_merge(_merge(first, _Node(task, random.random())), rest))
+
+    def append(self, task):
+        return self.insert(len(self), task)
+
+    def extend(self, tasks):
+        return TaskList._from_root(_merge(self._root, _build(tasks)))
+
+    def insert_many(self, index, tasks):
+        # The new tasks are built into one subtree, then merged in once
+        first, rest = _split(self._root, index)
+        return TaskList._from_root(_merge(_merge(first, _build(tasks)), rest))
+
+    def delete(self, index):
+        first, rest = _split(self._root, index)
+        _, rest = _split(rest, 1)
+        return TaskList._from_root(_merge(first, rest))
+
+    def replace(self, index, task):
+        first, rest = _split(self._root, index)
+        _, rest = _split(rest, 1)
+        return TaskList._from_root(_merge(_merge(first, _Node(task, random.random())), rest))
+
+    def move(self, source, target):
+        task = self[source]
+        return self.delete(source).insert(target, task)
+
+    def slice(self, start, stop):
+        # Tasks in [start, stop) without walking the part of the list before them
+        start = max(0, start)
+        return list(itertools.islice(_iter_nodes(self._root, start), max(0, stop - start)))
+
+    def take(self, indices):
+        return [self[i] for i in indices]
+
+    def delete_many(self, indices):
+        # Cut out each index once, working back to front: O(k log n)
+        root = self._root
+        for index in sorted(set(indices), reverse=True):
+            first, rest = _split(root, index)
+            _, rest = _split(rest, 1)
+            root = _merge(first, rest)
+        return TaskList._from_root(root)
+
+    def positions_of(self, task_ids, start=0, stop=None):
+        # Map task ids to their current positions. This walks the list, so a
+        # caller that knows where the tasks probably are (the page they were
+        # picked from) passes that as [start, stop): it's searched first, and
+        # the rest of the list only for ids that weren't found there.
+        wanted = set(task_ids)
+        positions = {}
+        total = len(self)
+        start = max(0, min(start, total))
+        stop = total if stop is None else max(start, min(stop, total))
+        for first, last in ((start, stop), (0, start), (stop, total)):
+            if len(positions) == len(wanted):
+                break
+            tasks = itertools.islice(_iter_nodes(self._root, first), last - first)
+            for index, task in enumerate(tasks, first):
+                if task.id in wanted:
+                    positions[task.id] = index
+                    if len(positions) == len(wanted):
+                        break
+        return positions
+
+    def diff(self, previous):
+        # (tasks removed, tasks added) since `previous`, found by walking only
+        # the nodes the two versions don't share. A moved task is in neither.
+        old_nodes, new_nodes = _diff_nodes(previous._root, self._root)
+        old_tasks = {id(node.task): node.task for node in old_nodes}
+        new_tasks = {id(node.task): node.task for node in new_nodes}
+        removed = [task for key, task in old_tasks.items() if key not in new_tasks]
+        added = [task for key, task in new_tasks.items() if key not in old_tasks]
+        return removed, added
+
+    def unshared_bytes(self, other):
+        # Rough memory this version holds that `other` doesn't share: its own
+        # nodes plus the tasks only they refer to
+        mine, theirs = _diff_nodes(self._root, other._root)
+        kept = {id(node.task) for node in theirs}
+        return len(mine) * _NODE_BYTES + sum(
+            _task_bytes(node.task) for node in mine if id(node.task) not in kept
+        )
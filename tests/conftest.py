@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# The app's modules sit at the repo root, the GitHub stand-in in benchmarks/
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "benchmarks")]
@@ -0,0 +1,146 @@
+import pytest
+import requests
+
+import github_scheduler
+from github_scheduler import RateLimitWait, RequestScheduler
+
+
+class FakeClock:
+    # Monotonic and wall clocks that only move when the scheduler sleeps
+    def __init__(self):
+        self.now = 0.0
+        self.wall = 1_700_000_000.0
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+        self.wall += seconds
+
+    def waited(self):
+        return [seconds for seconds in self.sleeps if seconds]
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def scheduler(clock):
+    return RequestScheduler(clock=lambda: clock.now, wall_clock=lambda: clock.wall, sleep=clock.sleep)
+
+
+def response(status, body="{}", **headers):
+    result = requests.models.Response()
+    result.status_code = status
+    result._content = body.encode()
+    result.headers.update({name.replace("_", "-"): str(value) for name, value in headers.items()})
+    return result
+
+
+def sender(*responses):
+    # send() handing out `responses` in order; an exception instance is raised
+    queue = list(responses)
+    calls = []
+
+    def send():
+        calls.append(len(calls))
+        item = queue.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    send.calls = calls
+    return send
+
+
+@pytest.mark.parametrize("status", [429, 403])
+def test_retry_after_holds_the_retry(scheduler, clock, status):
+    send = sender(response(status, Retry_After=30), response(200))
+    assert scheduler.request("tok", "POST", send).status_code == 200
+    assert len(send.calls) == 2
+    assert clock.waited() == [30]
+
+
+def test_exhausted_limit_waits_until_the_reset(scheduler, clock):
+    reset = int(clock.wall) + 20
+    send = sender(
+        response(403, X_RateLimit_Remaining=0, X_RateLimit_Reset=reset),
+        response(200, X_RateLimit_Remaining=4999, X_RateLimit_Reset=reset + 3600)
+    )
+    assert scheduler.request("tok", "GET", send).status_code == 200
+    assert clock.waited() == [20]
+    assert clock.wall == reset
+
+
+def test_exhausted_limit_also_holds_the_next_request(scheduler, clock):
+    # The last call in the window succeeded, but the next one must wait
+    reset = int(clock.wall) + 15
+    scheduler.request("tok", "GET", sender(response(200, X_RateLimit_Remaining=0, X_RateLimit_Reset=reset)))
+    assert clock.waited() == []
+    scheduler.request("tok", "GET", sender(response(200)))
+    assert clock.waited() == [15]
+    # Other tokens have their own limits
+    scheduler.request("other", "GET", sender(response(200)))
+    assert clock.waited() == [15]
+
+
+def test_secondary_limit_detected_from_the_body_alone(scheduler, clock):
+    body = '{"message": "You have exceeded a secondary rate limit. Please wait a few minutes."}'
+    send = sender(response(403, body), response(201))
+    assert scheduler.request("tok", "POST", send).status_code == 201
+    assert clock.waited() == [github_scheduler.SECONDARY_LIMIT_WAIT]
+
+
+def test_other_forbidden_responses_are_returned_as_they_are(scheduler, clock):
+    send = sender(response(403, '{"message": "Resource not accessible by integration"}'))
+    assert scheduler.request("tok", "GET", send).status_code == 403
+    assert len(send.calls) == 1 and clock.waited() == []
+
+
+def test_a_wait_beyond_the_cutoff_raises_instead_of_sleeping(scheduler, clock):
+    send = sender(response(429, Retry_After=3600))
+    with pytest.raises(RateLimitWait) as error:
+        scheduler.request("tok", "GET", send)
+    assert error.value.seconds == 3600
+    assert len(send.calls) == 1 and clock.waited() == []
+    # Later requests on the token fail without being sent, until the wait is over
+    send = sender(response(200))
+    with pytest.raises(RateLimitWait):
+        scheduler.request("tok", "GET", send)
+    assert send.calls == []
+    clock.sleep(3600)
+    assert scheduler.request("tok", "GET", send).status_code == 200
+
+
+def test_low_remaining_spreads_requests_until_the_reset(scheduler, clock):
+    reset = int(clock.wall) + 100
+    scheduler.request("tok", "GET", sender(response(200, X_RateLimit_Remaining=50, X_RateLimit_Reset=reset)))
+    scheduler.request("tok", "GET", sender(response(200)))
+    assert clock.waited() == [2]
+
+
+@pytest.mark.parametrize("method", ["POST", "PATCH"])
+@pytest.mark.parametrize("failure", [response(502), requests.ConnectionError("reset")])
+def test_non_idempotent_methods_are_not_retried(scheduler, clock, method, failure):
+    send = sender(failure, response(200))
+    if isinstance(failure, Exception):
+        with pytest.raises(requests.ConnectionError):
+            scheduler.request("tok", method, send)
+    else:
+        assert scheduler.request("tok", method, send).status_code == 502
+    assert len(send.calls) == 1 and clock.waited() == []
+
+
+def test_idempotent_methods_back_off_and_give_up(scheduler, clock, monkeypatch):
+    # Always the longest jittered delay
+    monkeypatch.setattr(github_scheduler.random, "uniform", lambda low, high: high)
+    send = sender(requests.Timeout("slow"), response(503), response(200))
+    assert scheduler.request("tok", "PUT", send).status_code == 200
+    assert clock.waited() == [1, 2]
+
+    send = sender(*[response(500)] * github_scheduler.MAX_ATTEMPTS)
+    assert scheduler.request("tok", "GET", send).status_code == 500
+    assert len(send.calls) == github_scheduler.MAX_ATTEMPTS
+    assert scheduler.status("tok") == (0, None)
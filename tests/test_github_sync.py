@@ -0,0 +1,135 @@
+import pytest
+
+import fake_github
+import github_sync
+from task_archive import archive_record
+from task_store import Task
+
+LIST_NAMES = {"list1": "Personal Tasks", "list2": "Work Tasks"}
+
+
+def start(monkeypatch, repo=None):
+    repo, url = fake_github.start(repo)
+    monkeypatch.setattr(github_sync, "API_URL", url)
+    return repo
+
+
+@pytest.fixture
+def repo(monkeypatch):
+    return start(monkeypatch)
+
+
+def client(name):
+    return github_sync.GitHubClient("owner/repo", name)
+
+
+def titles(tasks):
+    return [task.title for task in tasks]
+
+
+def added(lists, list_id, title):
+    return {**lists, list_id: lists[list_id].append(Task(title))}
+
+
+def stored(repo, list_id="list1"):
+    return repo.read_path(f"ToDoList/{list_id}.txt").decode()
+
+
+def test_save_merges_after_the_branch_moved(repo):
+    ours, theirs = client("ours"), client("theirs")
+    lists, _ = ours.load(LIST_NAMES)
+    other, _ = theirs.load(LIST_NAMES)
+    theirs.save(added(added(other, "list1", "theirs"), "list2", "work"), LIST_NAMES)
+
+    sent = added(lists, "list1", "ours")
+    repo.calls.clear()
+    saved = ours.save(sent, LIST_NAMES)
+
+    # The ref update was refused once, then the merge went in on top of theirs
+    assert [call for call in repo.calls if call[0] == "PATCH"] == [("PATCH", "/git/refs/heads/main")] * 2
+    assert saved is not sent
+    # Ours goes after what precedes it in ours: nothing, so first
+    assert titles(saved["list1"]) == ["ours", "theirs"]
+    assert titles(saved["list2"]) == ["work"]
+    assert "- ours\n- theirs\n" in stored(repo)
+    assert "- work\n" in stored(repo, "list2")
+
+    # Nothing left to write
+    repo.calls.clear()
+    assert ours.save(saved, LIST_NAMES) is saved
+    assert repo.calls == []
+
+
+def test_save_gives_up_after_repeated_conflicts(repo):
+    ours = client("ours")
+    lists, _ = ours.load(LIST_NAMES)
+    repo.fail_next(422, times=github_sync.SAVE_ATTEMPTS)
+    with pytest.raises(github_sync.GitHubError):
+        ours.save(added(lists, "list1", "x"), LIST_NAMES)
+
+
+def test_client_without_a_base_merges_instead_of_overwriting(repo):
+    first = client("first")
+    lists, _ = first.load(LIST_NAMES)
+    first.save(added(lists, "list1", "saved"), LIST_NAMES)
+
+    # Lists restored from elsewhere, through a client that never loaded
+    fresh = client("fresh")
+    restored = {list_id: lists[list_id] for list_id in LIST_NAMES}
+    saved = fresh.save(added(restored, "list1", "restored"), LIST_NAMES)
+    assert sorted(titles(saved["list1"])) == ["restored", "saved"]
+    assert "- saved\n" in stored(repo) and "- restored\n" in stored(repo)
+
+
+def test_load_archive_leaves_the_sync_base_alone(repo):
+    a, b = client("a"), client("b")
+    lists_a, _ = a.load(LIST_NAMES)
+    lists_b, _ = b.load(LIST_NAMES)
+    a.save(added(lists_a, "list1", "x"), LIST_NAMES, archive=[archive_record("list1", Task("done"))])
+
+    assert [record["title"] for record in b.load_archive()] == ["done"]
+    saved = b.save(added(lists_b, "list1", "y"), LIST_NAMES)
+    assert sorted(titles(saved["list1"])) == ["x", "y"]
+    assert "- x\n" in stored(repo)
+
+
+def test_first_save_to_an_empty_repository(monkeypatch):
+    repo = start(monkeypatch, fake_github.FakeRepo(empty=True))
+    ours = client("ours")
+    lists, modified = ours.load(LIST_NAMES)
+    assert modified and not any(lists.values())
+    assert ours.load_archive() == []
+
+    ours.save(added(lists, "list1", "first"), LIST_NAMES, archive=[archive_record("list1", Task("done"))])
+    assert "- first\n" in stored(repo)
+    assert repo.read_path(github_sync.README_PATH) == github_sync.README
+    assert len(client("other").load_archive()) == 1
+
+
+def test_first_save_creates_a_missing_branch(monkeypatch):
+    repo = fake_github.FakeRepo()
+    repo.refs = {"other": repo.refs.pop("main")}
+    repo = start(monkeypatch, repo)
+    a, b = client("a"), client("b")
+    lists_a, _ = a.load(LIST_NAMES)
+    lists_b, _ = b.load(LIST_NAMES)
+
+    a.save(added(lists_a, "list1", "x"), LIST_NAMES)
+    assert ("POST", "/git/refs") in repo.calls
+    # b also saw no branch, but must not overwrite the one a created
+    b.save(added(lists_b, "list1", "y"), LIST_NAMES)
+    assert "- x\n" in stored(repo) and "- y\n" in stored(repo)
+
+
+def test_check_access_needs_push_permission(monkeypatch):
+    start(monkeypatch, fake_github.FakeRepo(tokens={"writer": "push", "reader": "pull"}))
+    for token, status in [("stranger", 404), ("reader", 403)]:
+        denied = client(token)
+        with pytest.raises(github_sync.GitHubError) as error:
+            denied.check_access()
+        assert error.value.status_code == status
+        assert not denied.verified
+
+    writer = client("writer")
+    writer.check_access()
+    assert writer.verified and writer.branch == "main"
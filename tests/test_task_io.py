@@ -0,0 +1,113 @@
+import pytest
+
+import task_io
+from task_io import detect_format, iter_export, read_file, read_text
+from task_store import Task, TaskList
+
+LIST_NAMES = {"list1": "Personal Tasks", "list2": "Work Tasks", "list3": "Shopping List"}
+
+
+def rows(tasks):
+    return {
+        list_id: [(task.title, task.description) for task in items]
+        for list_id, items in tasks.items()
+    }
+
+
+def test_detect_format():
+    assert detect_format("tasks.CSV") == "csv"
+    assert detect_format("tasks.ndjson") == "jsonl"
+    assert detect_format("ToDoList.txt") == "txt"
+    assert detect_format("notes") == "txt"
+
+
+def test_csv_reads_list_by_id_or_name_and_defaults_to_the_target():
+    text = (
+        "title,description,list\n"
+        "a,first,Work Tasks\n"
+        '"b, quoted","two\nlines",list3\n'
+        "c,,\n"
+        ",skipped,list2\n"
+    )
+    assert rows(read_text(text, "csv", LIST_NAMES, "list1")) == {
+        "list2": [("a", "first")],
+        "list3": [("b, quoted", "two\nlines")],
+        "list1": [("c", "")]
+    }
+
+
+def test_csv_errors():
+    with pytest.raises(ValueError, match="'title' column"):
+        read_text("name,list\na,list1\n", "csv", LIST_NAMES, "list1")
+    with pytest.raises(ValueError, match="line 3: unknown list 'Nope'"):
+        read_text("title,list\na,list1\nb,Nope\n", "csv", LIST_NAMES, "list1")
+
+
+def test_jsonl_reads_objects_and_coerces_titles():
+    text = (
+        '{"title": "a", "description": "x", "list": "work tasks"}\n'
+        "\n"
+        '{"title": 42}\n'
+        '{"title": "", "list": "list2"}\n'
+    )
+    assert rows(read_text(text, "jsonl", LIST_NAMES, "list1")) == {
+        "list2": [("a", "x")],
+        "list1": [("42", "")]
+    }
+
+
+@pytest.mark.parametrize("line, message", [
+    ('{"title": "a", "list": 5}', "line 2: list must be a string"),
+    ('{"title": "a", "list": ["list2"]}', "line 2: list must be a string"),
+    ('{"title": "a", "list": "nope"}', "line 2: unknown list 'nope'"),
+    ('["a"]', "line 2: expected an object"),
+    ("{not json", "line 2: not valid JSON"),
+])
+def test_jsonl_errors_name_the_line(line, message):
+    text = '{"title": "ok"}\n' + line + "\n"
+    with pytest.raises(ValueError, match=message):
+        read_text(text, "jsonl", LIST_NAMES, "list1")
+
+
+def test_text_reads_the_todolist_layout_and_bare_lines():
+    text = (
+        "loose task\n"
+        "=== Work Tasks ===\n"
+        "- report\n"
+        "  Description: due friday\n"
+        "- call\n"
+        "\n"
+        "=== list3 ===\n"
+        "milk\n"
+    )
+    assert rows(read_text(text, "txt", LIST_NAMES, "list1")) == {
+        "list1": [("loose task", "")],
+        "list2": [("report", "due friday"), ("call", "")],
+        "list3": [("milk", "")]
+    }
+    with pytest.raises(ValueError, match="line 1: unknown list 'Other'"):
+        read_text("=== Other ===\n- a\n", "txt", LIST_NAMES, "list1")
+
+
+def test_read_file_skips_a_byte_order_mark(tmp_path):
+    path = tmp_path / "tasks.csv"
+    path.write_bytes("\ufefftitle,list\nä,list2\n".encode("utf-8"))
+    assert rows(read_file(path, "csv", LIST_NAMES, "list1")) == {"list2": [("ä", "")]}
+
+
+@pytest.mark.parametrize("fmt", sorted(task_io.FORMATS))
+def test_export_reads_back_the_same_tasks(fmt, monkeypatch):
+    # Small chunks, so rows are split across several of them
+    monkeypatch.setattr(task_io, "CHUNK_SIZE", 64)
+    lists = {
+        "list1": TaskList([Task("plain"), Task('comma, "quote"', "ünïcode ✓")]),
+        "list2": TaskList(Task(f"task {i}", f"note {i}" if i % 2 else "") for i in range(50)),
+        "list3": TaskList()
+    }
+    chunks = list(iter_export(lists, LIST_NAMES, fmt))
+    assert len(chunks) > 1
+    read = read_text("".join(chunks), fmt, LIST_NAMES, "list3")
+    assert rows(read) == {
+        list_id: [(task.title, task.description) for task in tasks]
+        for list_id, tasks in lists.items() if tasks
+    }
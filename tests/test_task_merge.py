@@ -0,0 +1,115 @@
+import random
+
+from task_merge import merge_lists
+from task_store import Task, TaskList
+
+
+def titles(lists):
+    return {list_id: [task.title for task in tasks] for list_id, tasks in lists.items()}
+
+
+a, b, c, d, e = (Task(title) for title in "abcde")
+BASE = {"L": TaskList([a, b, c, d]), "M": TaskList([e])}
+
+
+def test_unchanged_lists_pass_through():
+    assert merge_lists(BASE, BASE, BASE)["L"] is BASE["L"]
+    ours = {**BASE, "L": BASE["L"].append(Task("x"))}
+    assert merge_lists(BASE, ours, BASE)["L"] is ours["L"]
+    assert merge_lists(BASE, BASE, ours)["L"] is ours["L"]
+
+
+def test_concurrent_adds_and_edits():
+    x, y = Task("x"), Task("y")
+    ours = {**BASE, "L": BASE["L"].replace(1, b.replace(title="B")).append(x)}
+    theirs = {**BASE, "L": TaskList([y, a, b.replace(description="desc"), c])}
+    merged = merge_lists(BASE, ours, theirs)
+    # Both adds kept, their delete of d applied, both edits to b combined
+    assert titles(merged) == {"L": ["y", "a", "B", "c", "x"], "M": ["e"]}
+    assert [task.description for task in merged["L"]] == ["", "", "desc", "", ""]
+
+
+def test_same_field_edited_on_both_sides_keeps_ours():
+    ours = {**BASE, "L": BASE["L"].replace(0, a.replace(title="ours"))}
+    theirs = {**BASE, "L": BASE["L"].replace(0, a.replace(title="theirs", description="d"))}
+    merged = merge_lists(BASE, ours, theirs)["L"]
+    assert (merged[0].title, merged[0].description) == ("ours", "d")
+
+
+def test_edit_wins_over_delete():
+    ours = {**BASE, "L": TaskList([a, b, d])}
+    theirs = {**BASE, "L": TaskList([a, b, c.replace(title="c2"), d])}
+    assert titles(merge_lists(BASE, ours, theirs))["L"] == ["a", "b", "c2", "d"]
+    # Either way round
+    assert titles(merge_lists(BASE, theirs, ours))["L"] == ["a", "b", "c2", "d"]
+
+
+def test_delete_on_both_sides():
+    ours = {**BASE, "L": TaskList([a, b, d]).append(Task("x"))}
+    theirs = {**BASE, "L": TaskList([a, b, d])}
+    assert titles(merge_lists(BASE, ours, theirs))["L"] == ["a", "b", "d", "x"]
+
+
+def test_move_to_another_list_keeps_their_edit():
+    ours = {"L": TaskList([a, c, d]), "M": TaskList([e, b])}
+    theirs = {"L": TaskList([a, b.replace(title="b2"), c, d]), "M": TaskList()}
+    assert titles(merge_lists(BASE, ours, theirs)) == {"L": ["a", "c", "d"], "M": ["b2"]}
+
+
+def test_both_move_the_same_task_ours_wins():
+    ours = {"L": TaskList([a, c, d]), "M": TaskList([e, b])}
+    theirs = {"L": TaskList([a, c, d]), "M": TaskList([e]), "N": TaskList([b])}
+    base = {**BASE, "N": TaskList()}
+    merged = merge_lists(base, {**ours, "N": base["N"]}, theirs)
+    assert titles(merged) == {"L": ["a", "c", "d"], "M": ["e", "b"], "N": []}
+
+
+def test_reorder_on_both_sides():
+    # Ours moves c to the top, theirs moves a to the bottom
+    ours = {**BASE, "L": TaskList([c, a, b, d])}
+    theirs = {**BASE, "L": TaskList([b, c, d, a])}
+    assert titles(merge_lists(BASE, ours, theirs))["L"] == ["c", "b", "d", "a"]
+
+
+def test_random_edits_never_duplicate_or_invent_tasks():
+    rng = random.Random(23)
+
+    def mutate(lists):
+        lists = dict(lists)
+        for _ in range(rng.randint(1, 6)):
+            list_id = rng.choice("LM")
+            tasks = lists[list_id]
+            roll = rng.random()
+            if roll < 0.25:
+                lists[list_id] = tasks.append(Task("new"))
+            elif not tasks:
+                continue
+            elif roll < 0.45:
+                lists[list_id] = tasks.delete(rng.randrange(len(tasks)))
+            elif roll < 0.65:
+                i = rng.randrange(len(tasks))
+                lists[list_id] = tasks.replace(i, tasks[i].replace(title="edited"))
+            elif roll < 0.85:
+                lists[list_id] = tasks.move(rng.randrange(len(tasks)), rng.randrange(len(tasks)))
+            else:
+                # Move to the other list
+                i = rng.randrange(len(tasks))
+                other = "M" if list_id == "L" else "L"
+                lists[other] = lists[other].append(tasks[i])
+                lists[list_id] = tasks.delete(i)
+        return lists
+
+    for _ in range(300):
+        tasks = [Task(str(i)) for i in range(30)]
+        base = {"L": TaskList(tasks[:15]), "M": TaskList(tasks[15:])}
+        ours, theirs = mutate(base), mutate(base)
+        merged = merge_lists(base, ours, theirs)
+        ids = [task.id for tasks in merged.values() for task in tasks]
+        assert len(ids) == len(set(ids))
+        known = {task.id for side in (base, ours, theirs) for tasks in side.values() for task in tasks}
+        assert set(ids) <= known
+        # Added on either side: never lost
+        for side in (ours, theirs):
+            base_ids = {task.id for tasks in base.values() for task in tasks}
+            added = {task.id for tasks in side.values() for task in tasks} - base_ids
+            assert added <= set(ids)
@@ -0,0 +1,178 @@
+import random
+
+import pytest
+
+import task_store
+from task_store import Task, TaskList
+
+
+def tasks(count, prefix="t"):
+    return [Task(f"{prefix}{i}") for i in range(count)]
+
+
+def titles(items):
+    return [task.title for task in items]
+
+
+def check_tree(tasks_list):
+    # Sizes add up and every parent outranks its children
+    def walk(node):
+        if node is None:
+            return 0
+        for child in (node.left, node.right):
+            assert child is None or child.priority <= node.priority
+        size = 1 + walk(node.left) + walk(node.right)
+        assert node.size == size
+        return size
+
+    walk(tasks_list._root)
+
+
+def ids(items):
+    return {task.id for task in items}
+
+
+def test_updates_return_new_versions_and_leave_the_old_alone():
+    items = tasks(5)
+    original = TaskList(items)
+    assert titles(original.insert(2, Task("new"))) == ["t0", "t1", "new", "t2", "t3", "t4"]
+    assert titles(original.append(Task("end"))) == ["t0", "t1", "t2", "t3", "t4", "end"]
+    assert titles(original.delete(0)) == ["t1", "t2", "t3", "t4"]
+    assert titles(original.replace(4, items[4].replace(title="T4"))) == ["t0", "t1", "t2", "t3", "T4"]
+    assert titles(original.move(0, 3)) == ["t1", "t2", "t3", "t0", "t4"]
+    assert titles(original.move(4, 0)) == ["t4", "t0", "t1", "t2", "t3"]
+    assert titles(original.extend(tasks(2, "x"))) == ["t0", "t1", "t2", "t3", "t4", "x0", "x1"]
+    assert list(original) == items
+    assert not TaskList() and original and len(original) == 5
+
+
+def test_insert_many_and_delete_many():
+    original = TaskList(tasks(6))
+    assert titles(original.insert_many(0, tasks(2, "x"))) == ["x0", "x1", "t0", "t1", "t2", "t3", "t4", "t5"]
+    assert titles(original.insert_many(3, tasks(2, "x"))) == ["t0", "t1", "t2", "x0", "x1", "t3", "t4", "t5"]
+    assert titles(original.insert_many(6, [])) == titles(original)
+    # Repeated and unordered indices are each removed once
+    assert titles(original.delete_many([5, 0, 2, 2])) == ["t1", "t3", "t4"]
+    assert titles(original.delete_many([])) == titles(original)
+
+
+def test_indexing_and_slice():
+    items = tasks(10)
+    listed = TaskList(items)
+    assert listed[0] is items[0] and listed[-1] is items[-1]
+    with pytest.raises(IndexError):
+        listed[10]
+    assert listed.slice(3, 6) == items[3:6]
+    assert listed.slice(-5, 2) == items[:2]
+    assert listed.slice(8, 20) == items[8:]
+    assert listed.slice(6, 3) == []
+    assert listed.take([9, 0, 4]) == [items[9], items[0], items[4]]
+
+
+def test_positions_of_with_and_without_a_window():
+    items = tasks(20)
+    listed = TaskList(items)
+    wanted = [items[1].id, items[7].id, items[15].id, "missing"]
+    expected = {items[1].id: 1, items[7].id: 7, items[15].id: 15}
+    assert listed.positions_of(wanted) == expected
+    # In the window, before it and after it
+    assert listed.positions_of(wanted, 5, 10) == expected
+    # Windows past either end are clamped
+    assert listed.positions_of(wanted, -3, 100) == expected
+    assert listed.positions_of(wanted, 50, 60) == expected
+    assert listed.positions_of([], 5, 10) == {}
+
+
+def test_positions_of_stops_once_the_window_has_everything(monkeypatch):
+    items = tasks(100)
+    listed = TaskList(items)
+    walked = []
+    iter_nodes = task_store._iter_nodes
+
+    def counting(node, start=0):
+        for task in iter_nodes(node, start):
+            walked.append(task)
+            yield task
+
+    monkeypatch.setattr(task_store, "_iter_nodes", counting)
+    assert listed.positions_of([items[52].id], 50, 60) == {items[52].id: 52}
+    assert walked == items[50:53]
+
+
+def test_diff_reports_exactly_the_changed_tasks():
+    items = tasks(50)
+    base = TaskList(items)
+    assert base.diff(base) == ([], [])
+
+    new = Task("new")
+    edited = items[10].replace(title="edited")
+    later = base.replace(10, edited).insert(3, new).delete(20)
+    removed, added = later.diff(base)
+    assert ids(removed) == {items[10].id, items[19].id}
+    assert len(removed) == 2 and items[10] in removed and items[19] in removed
+    assert len(added) == 2 and new in added and edited in added
+
+    # Across several versions only the net change shows
+    assert base.insert(0, Task("gone")).delete(0).diff(base) == ([], [])
+    # A moved task is in neither
+    assert base.move(5, 40).diff(base) == ([], [])
+    # Rebuilt from the same tasks: nothing, though no node is shared
+    assert TaskList(items).diff(base) == ([], [])
+    # Against an unrelated list, everything
+    fresh = TaskList(tasks(3, "x"))
+    removed, added = fresh.diff(base)
+    assert ids(removed) == ids(items) and ids(added) == ids(fresh)
+
+
+def test_random_updates_match_a_plain_list():
+    rng = random.Random(1234)
+    model = tasks(30)
+    listed = TaskList(model)
+    for step in range(500):
+        previous, previous_model = listed, list(model)
+        op = rng.choice(["insert", "delete", "move", "insert_many", "delete_many", "replace"])
+        if op == "insert":
+            index, task = rng.randint(0, len(model)), Task(f"i{step}")
+            listed = listed.insert(index, task)
+            model.insert(index, task)
+        elif op == "insert_many":
+            index, new = rng.randint(0, len(model)), tasks(rng.randint(0, 5), f"m{step}-")
+            listed = listed.insert_many(index, new)
+            model[index:index] = new
+        elif not model:
+            continue
+        elif op == "delete":
+            index = rng.randrange(len(model))
+            listed = listed.delete(index)
+            del model[index]
+        elif op == "delete_many":
+            indices = [rng.randrange(len(model)) for _ in range(rng.randint(1, 4))]
+            listed = listed.delete_many(indices)
+            model = [task for i, task in enumerate(model) if i not in set(indices)]
+        elif op == "replace":
+            index = rng.randrange(len(model))
+            task = model[index].replace(title=f"r{step}")
+            listed = listed.replace(index, task)
+            model[index] = task
+        else:
+            source, target = rng.randrange(len(model)), rng.randrange(len(model))
+            listed = listed.move(source, target)
+            model.insert(target, model.pop(source))
+
+        assert list(listed) == model
+        assert len(listed) == len(model)
+        check_tree(listed)
+        # The previous version is untouched
+        assert list(previous) == previous_model
+
+        removed, added = listed.diff(previous)
+        before, after = {id(task) for task in previous_model}, {id(task) for task in model}
+        assert {id(task) for task in removed} == before - after
+        assert {id(task) for task in added} == after - before
+
+        start = rng.randint(0, len(model))
+        stop = rng.randint(start, len(model) + 2)
+        assert listed.slice(start, stop) == model[start:stop]
+        sample = rng.sample(model, min(3, len(model)))
+        positions = listed.positions_of([task.id for task in sample], start, stop)
+        assert positions == {task.id: model.index(task) for task in sample}
@@ -0,0 +1,165 @@
+"""Reader and writer for the ToDoList.txt format.
+
+    === Personal Tasks ===
+    - Task title
+      Description: optional description
+
+The writer yields the document in chunks and the parser consumes it one line
+at a time, so neither side needs the whole file as a single string.
+
+Snapshots are a JSON form of the same data that also keeps task ids and
+any text, newlines included. They are used for the local caches and,
+gzipped, stored next to each list file in the repo.
+"""
+import gzip
+import io
+import json
+
+from task_store import Task, TaskList
+
+DESCRIPTION_PREFIX = "  Description:"
+
+
+def _one_line(text):
+    # The text format is line based; the snapshot keeps the original
+    return " ".join(text.splitlines()) if "\n" in text or "\r" in text else text
+
+
+def iter_list_chunks(list_name, tasks):
+    # One chunk for the header and one per task
+    yield f"=== {list_name} ===\n"
+    for task in tasks:
+        if task.description.strip():
+            yield f"- {_one_line(task.title)}\n{DESCRIPTION_PREFIX} {_one_line(task.description)}\n"
+        else:
+            yield f"- {_one_line(task.title)}\n"
+    yield "\n"
+
+
+def iter_chunks(lists, list_names):
+    for list_id, list_name in list_names.items():
+        yield from iter_list_chunks(list_name, lists[list_id])
+
+
+def format_lists(lists, list_names):
+    buffer = io.StringIO()
+    for chunk in iter_chunks(lists, list_names):
+        buffer.write(chunk)
+    return buffer.getvalue()
+
+
+def encode_lists(lists, list_names):
+    return format_lists(lists, list_names).encode()
+
+
+def encode_list(list_name, tasks):
+    # A single list in the same format, as stored in its own file
+    buffer = io.StringIO()
+    for chunk in iter_list_chunks(list_name, tasks):
+        buffer.write(chunk)
+    return buffer.getvalue().encode()
+
+
+class ToDoParser:
+    """Incremental parser: feed() lines in order, then call close()."""
+
+    def __init__(self, list_names):
+        self.list_ids = {name: list_id for list_id, name in list_names.items()}
+        self.tasks = {list_id: [] for list_id in list_names}
+        self.current_list_id = None
+        # A task is held back until the next line shows whether it has a description
+        self.pending = None
+
+    def _flush_pending(self, description=""):
+        if self.pending is not None:
+            list_id, title = self.pending
+            self.tasks[list_id].append(Task(title, description))
+            self.pending = None
+
+    def feed(self, line):
+        line = line.rstrip()
+        if self.pending is not None and line.startswith(DESCRIPTION_PREFIX):
+            self._flush_pending(line[len(DESCRIPTION_PREFIX):].strip())
+            return
+        self._flush_pending()
+        if not line:
+            return
+        if line.startswith('===') and line.endswith('==='):
+            self.current_list_id = self.list_ids.get(line.strip('= '))
+        elif line.startswith('- ') and self.current_list_id:
+            self.pending = (self.current_list_id, line[2:])
+
+    def close(self):
+        self._flush_pending()
+        return {list_id: TaskList(tasks) for list_id, tasks in self.tasks.items()}
+
+
+def parse_lines(lines, list_names):
+    parser = ToDoParser(list_names)
+    for line in lines:
+        parser.feed(line)
+    return parser.close()
+
+
+def parse_text(text, list_names):
+    return parse_lines(io.StringIO(text), list_names)
+
+
+def parse_stream(stream, list_names, encoding="utf-8"):
+    # `stream` is any binary file-like object
+    return parse_lines(io.TextIOWrapper(stream, encoding=encoding), list_names)
+
+
+def parse_bytes(data, list_names):
+    return parse_stream(io.BytesIO(data), list_names)
+
+
+SNAPSHOT_VERSION = 1
+
+
+def dump_snapshot(lists, **meta):
+    # Compact arrays rather than objects per task: [id, title, description]
+    return json.dumps({
+        "version": SNAPSHOT_VERSION,
+        **meta,
+        "lists": {
+            list_id: [[task.id, task.title, task.description] for task in tasks]
+            for list_id, tasks in lists.items()
+        }
+    }, separators=(",", ":"))
+
+
+def snapshot_size(task):
+    # Bytes `task` adds to a list in dump_snapshot, separator included, so a
+    # list's size can be kept up to date from TaskList.diff() alone
+    return len(json.dumps([task.id, task.title, task.description], separators=(",", ":"))) + 1
+
+
+def load_snapshot(text, list_names):
+    # Returns (lists, meta); raises ValueError on anything we can't read
+    data = json.loads(text)
+    if not isinstance(data, dict) or data.get("version") != SNAPSHOT_VERSION:
+        raise ValueError("unsupported snapshot version")
+    stored = data.pop("lists")
+    lists = {
+        list_id: TaskList(
+            Task(title, description, task_id)
+            for task_id, title, description in stored.get(list_id, ())
+        )
+        for list_id in list_names
+    }
+    return lists, data
+
+
+def pack_snapshot(lists, **meta):
+    # Gzipped snapshot; mtime=0 keeps the bytes (and so the blob SHA) the
+    # same for the same lists
+    return gzip.compress(dump_snapshot(lists, **meta).encode(), mtime=0)
+
+
+def unpack_snapshot(data, list_names):
+    try:
+        text = gzip.decompress(data).decode()
+    except (OSError, EOFError, UnicodeDecodeError) as error:
+        raise ValueError(f"unreadable snapshot: {error}") from None
+    return load_snapshot(text, list_names)
@@ -1,4 +1,3 @@
-
 var shinyjs = {};
 
 shinyjs.loadFromStorage = function() {
@@ -10,6 +9,68 @@ shinyjs.loadFromStorage = function() {
     }
 }
 
-shinyjs.saveToStorage = function(params) {
-    localStorage.setItem('userData', params);
+// The snapshot this page last stored. The server only sends the lists that
+// changed since its previous write ("complete" on the first one), so they are
+// merged in here; kept per page so another tab's snapshot is never mixed in.
+shinyjs.storedSnapshot = null;
+
+shinyjs.saveToStorage = function(update) {
+    if (update.clear) {
+        // Too large to keep: better none than a stale one
+        shinyjs.storedSnapshot = null;
+        localStorage.removeItem('userData');
+        return;
+    }
+    var snapshot = JSON.parse(update.snapshot);
+    if (!update.complete && shinyjs.storedSnapshot) {
+        snapshot.lists = Object.assign(shinyjs.storedSnapshot.lists, snapshot.lists);
+    }
+    shinyjs.storedSnapshot = snapshot;
+    try {
+        localStorage.setItem('userData', JSON.stringify(snapshot));
+    } catch (e) {
+        // Quota exceeded: keep the previous snapshot rather than failing the page
+        console.warn('Could not save task snapshot to localStorage', e);
+    }
 }
+
+$(document).on('shiny:connected', function() {
+    Shiny.addCustomMessageHandler('save_to_storage', shinyjs.saveToStorage);
+    shinyjs.loadFromStorage();
+});
+
+// Drag a task within or between list cards. The server gets one drop_task
+// event and applies the whole reorder as a single update.
+$(document).on('dragstart', '.task-item', function(e) {
+    e.originalEvent.dataTransfer.setData('text/plain', $(this).attr('data-task-id'));
+    e.originalEvent.dataTransfer.effectAllowed = 'move';
+    // The list it came from, so the server only looks for it there
+    shinyjs.dragFrom = $(this).closest('.task-card').attr('data-list-id');
+});
+
+$(document).on('dragover', '.task-card', function(e) {
+    e.preventDefault();
+});
+
+$(document).on('drop', '.task-card', function(e) {
+    e.preventDefault();
+    var taskId = e.originalEvent.dataTransfer.getData('text/plain');
+    if (!taskId) {
+        return;
+    }
+    var target = $(e.target).closest('.task-item');
+    var before = null;
+    var after = false;
+    if (target.length) {
+        // Attribute, not .data(): ids are hex strings that may look numeric
+        before = target.attr('data-task-id');
+        after = e.originalEvent.clientY > target[0].getBoundingClientRect().top + target.outerHeight() / 2;
+    }
+    Shiny.setInputValue('drop_task', {
+        task: taskId,
+        from: shinyjs.dragFrom,
+        list: $(this).attr('data-list-id'),
+        before: before,
+        after: after
+    }, {priority: 'event'});
+});